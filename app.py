@@ -3,11 +3,14 @@ NELFT Mentoring Skills Assessment
 Main participant assessment application
 """
 
+import uuid
+
 import streamlit as st
 from data_manager import (
     QUESTIONS, RATING_LABELS, DEVELOPMENT_SUGGESTIONS,
-    get_active_cohorts, add_assessment, find_pre_assessment
+    get_active_cohorts, submit_assessment, find_pre_assessment
 )
+from records import Assessment
 
 # Page configuration
 st.set_page_config(
@@ -266,7 +269,7 @@ def show_participant_details():
         email = st.text_input("Email Address", placeholder="Enter your email address")
         
         cohorts = get_active_cohorts()
-        cohort_options = {c["name"]: c["id"] for c in cohorts}
+        cohort_options = {c.name: c.id for c in cohorts}
         selected_cohort_name = st.selectbox(
             "Programme Cohort",
             options=["Select your cohort..."] + list(cohort_options.keys())
@@ -351,6 +354,10 @@ def show_assessment():
     if "responses" not in st.session_state:
         st.session_state.responses = {}
     
+    # Idempotency key for this form: a repeated submit (double-click, rerun, retry) is saved only once
+    if "submission_key" not in st.session_state:
+        st.session_state.submission_key = uuid.uuid4().hex
+    
     with st.form("assessment_form"):
         responses = {}
         
@@ -415,20 +422,54 @@ def show_assessment():
                 "reflections": {
                     "reflection1": reflection1,
                     "reflection2": reflection2
-                }
+                },
+                "submission_key": st.session_state.submission_key
             }
             
-            # Save assessment
-            saved = add_assessment(assessment)
-            st.session_state.submitted_assessment = saved
+            # Queue it for the background writer; the confirmation page shows when it has been saved
+            st.session_state.submission_record = assessment
+            st.session_state.pending_submission = submit_assessment(assessment)
+            st.session_state.submitted_assessment = Assessment.from_dict(assessment)
             st.session_state.step = "confirmation"
             st.rerun()
 
 
+# Seconds between checks while a submission is still being written
+SAVE_STATUS_INTERVAL = 0.5
+
+
+def _poll_save_status():
+    if st.session_state.pending_submission.done():
+        st.rerun()
+    st.caption("Saving your responses…")
+
+
+def show_save_status():
+    """Show whether the submitted assessment has been written to storage yet"""
+    pending = st.session_state.get("pending_submission")
+    if pending is None:
+        return
+    
+    if not pending.done():
+        # Only this status line reruns while waiting; the rest of the page is already shown
+        st.fragment(_poll_save_status, run_every=SAVE_STATUS_INTERVAL)()
+        return
+    
+    if pending.exception() is None:
+        st.session_state.submitted_assessment = pending.result()
+        st.caption("✓ Your responses have been saved.")
+        return
+    
+    st.error("Your responses could not be saved. Please try again.")
+    if st.button("Retry Saving", type="primary"):
+        st.session_state.pending_submission = submit_assessment(dict(st.session_state.submission_record))
+        st.rerun()
+
+
 def show_confirmation():
     """Show confirmation and comparison (for post-assessment)"""
     assessment = st.session_state.submitted_assessment
-    is_post = assessment.get("assessment_type") == "post"
+    is_post = assessment.assessment_type == "post"
     pre_assessment = st.session_state.get("pre_assessment")
     
     st.markdown("""
@@ -437,21 +478,22 @@ def show_confirmation():
         <p>Thank you for completing your assessment.</p>
     </div>
     """, unsafe_allow_html=True)
+    show_save_status()
     
     if is_post and pre_assessment:
         # Show comparison
         st.markdown("<h3 class='comparison-header'>Your Development Journey</h3>", unsafe_allow_html=True)
         
         # Calculate stats
-        pre_avg = pre_assessment.get("average_score", 0)
-        post_avg = assessment.get("average_score", 0)
+        pre_avg = pre_assessment.average_score or 0
+        post_avg = assessment.average_score or 0
         improvement = post_avg - pre_avg
         
         # Count improved questions
         improved_count = 0
         for q in QUESTIONS:
-            pre_score = pre_assessment.get("responses", {}).get(q["id"], 0)
-            post_score = assessment.get("responses", {}).get(q["id"], 0)
+            pre_score = pre_assessment.score(q["id"])
+            post_score = assessment.score(q["id"])
             if post_score > pre_score:
                 improved_count += 1
         
@@ -469,8 +511,8 @@ def show_confirmation():
         
         comparison_data = []
         for q in QUESTIONS:
-            pre_score = pre_assessment.get("responses", {}).get(q["id"], 0)
-            post_score = assessment.get("responses", {}).get(q["id"], 0)
+            pre_score = pre_assessment.score(q["id"])
+            post_score = assessment.score(q["id"])
             change = post_score - pre_score
             
             comparison_data.append({
@@ -491,7 +533,7 @@ def show_confirmation():
             cat = q["category"]
             if cat not in category_scores:
                 category_scores[cat] = {"total": 0, "count": 0}
-            category_scores[cat]["total"] += assessment.get("responses", {}).get(q["id"], 0)
+            category_scores[cat]["total"] += assessment.score(q["id"])
             category_scores[cat]["count"] += 1
         
         # Find lowest scoring categories
@@ -516,7 +558,7 @@ def show_confirmation():
     
     elif is_post:
         st.info("Pre-programme comparison not available. Your post-programme scores have been recorded.")
-        st.metric("Your Average Score", f"{assessment.get('average_score', 0):.2f}")
+        st.metric("Your Average Score", f"{assessment.average_score or 0:.2f}")
     
     else:
         st.write("""
@@ -532,7 +574,8 @@ def show_confirmation():
     
     if st.button("Start New Assessment", use_container_width=True):
         # Clear session state
-        for key in ["step", "participant", "responses", "pre_assessment", "submitted_assessment"]:
+        for key in ["step", "participant", "responses", "pre_assessment", "submitted_assessment",
+                    "pending_submission", "submission_record", "submission_key"]:
             if key in st.session_state:
                 del st.session_state[key]
         st.rerun()
@@ -0,0 +1,143 @@
+"""
+Storage backend benchmark for NELFT Mentoring Assessment
+Times submissions, pre-assessment lookups and dashboard aggregations against each storage backend
+
+Usage:
+    python benchmark_backends.py
+    python benchmark_backends.py --backends jsonl sqlite --sizes 1000 10000 --submissions 200
+
+Each backend and data size runs in its own process against a fresh temporary
+data directory, seeded with the given number of assessments (pre and post
+pairs spread over the default cohorts). A "dashboard" operation is one
+Admin Dashboard refresh: it takes a snapshot and reads what the page reads
+from it (participants, KPIs, question averages from the shared running
+totals, recent submissions). Each refresh follows a new submission (not
+timed), so it sees a new data version, as it does while responses come in.
+Latencies are printed as p50, p95, p99 and max in milliseconds.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+BACKENDS = ("json", "jsonl", "sqlite")
+SIZES = (1000, 10000, 100000)
+OPERATIONS = ("submit", "pre lookup", "dashboard")
+
+
+def _assessment(number: int, cohort_id: str, assessment_type: str, submitted_at: str = None) -> dict:
+    assessment = {
+        "name": f"Participant {number}",
+        "email": f"participant{number}@nelft.nhs.uk",
+        "cohort": cohort_id,
+        "assessment_type": assessment_type,
+        "responses": {q: random.randint(1, 5) for q in range(1, 13)},
+        "reflections": {"reflection1": "", "reflection2": ""}
+    }
+    if submitted_at:
+        assessment["submitted_at"] = submitted_at
+    return assessment
+
+
+def _timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run_worker(size: int, submissions: int, lookups: int, dashboards: int) -> dict[str, list[float]]:
+    """Seed the store and time each operation (runs inside the benchmark subprocess)"""
+    import data_manager
+    from response_matrix import QuestionTotals
+
+    cohort_ids = [c.id for c in data_manager.load_cohorts()]
+    participants = (size + 1) // 2
+    start = datetime(2025, 1, 1)
+    seed = []
+    for i in range(size):
+        number = i // 2
+        submitted_at = (start + timedelta(minutes=i)).isoformat()
+        seed.append(_assessment(number, cohort_ids[number % len(cohort_ids)], "pre" if i % 2 == 0 else "post", submitted_at))
+    data_manager.add_assessments(seed)
+
+    question_totals = QuestionTotals()
+
+    def dashboard(cohort_id):
+        snapshot = data_manager.read_snapshot()
+        snapshot.get_participant_data()
+        snapshot.get_kpis().get(cohort_id)
+        question_totals.question_averages(snapshot, data_manager.get_changes, cohort_id)
+        snapshot.get_recent_assessments(cohort_id, limit=10)
+
+    timings = {
+        "submit": [
+            _timed(data_manager.add_assessment, _assessment(participants + i, random.choice(cohort_ids), "pre"))
+            for i in range(submissions)
+        ],
+        "pre lookup": [],
+        "dashboard": []
+    }
+    for _ in range(lookups):
+        number = random.randrange(participants)
+        cohort_id = cohort_ids[number % len(cohort_ids)]
+        timings["pre lookup"].append(
+            _timed(data_manager.find_pre_assessment, f"participant{number}@nelft.nhs.uk", cohort_id)
+        )
+    dashboard(None)  # The first refresh builds what later versions extend
+    for i in range(dashboards):
+        data_manager.add_assessment(_assessment(participants + submissions + i, random.choice(cohort_ids), "post"))
+        # Alternate between the all-cohorts view and a single cohort, as the sidebar filter does
+        timings["dashboard"].append(_timed(dashboard, None if i % 2 == 0 else random.choice(cohort_ids)))
+    return timings
+
+
+def run_benchmark(backend: str, size: int, submissions: int, lookups: int, dashboards: int) -> dict[str, list[float]]:
+    """Run one backend and size in a subprocess with its own data directory"""
+    with tempfile.TemporaryDirectory(prefix="assessment-bench-") as data_dir:
+        env = dict(os.environ, ASSESSMENT_DATA_DIR=data_dir, ASSESSMENT_STORAGE=backend,
+                   ASSESSMENT_COMPACTION_INTERVAL="0")
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", "--sizes", str(size), "--submissions", str(submissions),
+             "--lookups", str(lookups), "--dashboards", str(dashboards)],
+            env=env, check=True, capture_output=True, text=True
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the assessment storage backends")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES), help="Assessments to seed")
+    parser.add_argument("--submissions", type=int, default=100, help="Timed add_assessment calls")
+    parser.add_argument("--lookups", type=int, default=500, help="Timed find_pre_assessment calls")
+    parser.add_argument("--dashboards", type=int, default=20, help="Timed dashboard aggregations")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.sizes[0], args.submissions, args.lookups, args.dashboards)))
+        return 0
+
+    print(f"{'backend':<8} {'records':>8}  {'operation':<11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for size in args.sizes:
+        for backend in args.backends:
+            timings = run_benchmark(backend, size, args.submissions, args.lookups, args.dashboards)
+            for operation in OPERATIONS:
+                if not timings[operation]:
+                    continue
+                ms = np.array(timings[operation]) * 1000
+                p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+                print(f"{backend:<8} {size:>8}  {operation:<11} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} {ms.max():>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
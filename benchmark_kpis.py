@@ -0,0 +1,150 @@
+"""
+KPI engine benchmark for NELFT Mentoring Assessment
+Times the dashboard KPIs computed per participant in Python against the vectorised engine in kpis.py
+
+Usage:
+    python benchmark_kpis.py
+    python benchmark_kpis.py --sizes 1000 10000 100000 --cohorts 12 --repeats 5
+
+Participants are generated in memory (no storage is touched), spread over
+the given number of cohorts: most have both assessments, some only a pre
+or only a post. Each size reports median times for:
+
+    loop 1      the Python loop over one cohort, as the dashboard ran it per rerun
+    loop all    the loop over every cohort and the overall total
+    arrays      building the paired arrays from scratch (a cold start or a rewrite)
+    version     what a new data version costs the dashboard: extending the
+                previous version's arrays by one submission, then the engine
+    engine      the engine's single pass over every cohort
+
+The speedup compares loop 1 with the per-version cost. The engine's results,
+from scratch and extended, are checked against the loop's before timing.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from kpis import MAJORITY, cohort_kpis, extend_paired_arrays, paired_arrays, summarise
+from records import NUM_QUESTIONS, Assessment
+
+SIZES = (1000, 10000, 100000)
+
+
+def _assessment(number: int, cohort_id: str, assessment_type: str, shift: int = 0) -> Assessment:
+    responses = [min(5, max(1, random.randint(1, 4) + shift)) for _ in range(NUM_QUESTIONS)]
+    return Assessment(
+        id=f"assessment-{number}", name=f"Participant {number}", email=f"participant{number}@nelft.nhs.uk",
+        cohort=cohort_id, assessment_type=assessment_type, responses=tuple(responses),
+        average_score=sum(responses) / NUM_QUESTIONS
+    )
+
+
+def make_participants(size: int, cohorts: int) -> list[dict]:
+    """Synthetic participants as returned by get_participant_data"""
+    participants = []
+    for i in range(size):
+        cohort_id = f"cohort-{i % cohorts + 1}"
+        kind = random.random()
+        pre = _assessment(2 * i, cohort_id, "pre") if kind < 0.95 else None
+        post = _assessment(2 * i + 1, cohort_id, "post", shift=1) if kind > 0.2 else None
+        participants.append({
+            "name": f"Participant {i}", "email": f"participant{i}@nelft.nhs.uk", "cohort": cohort_id,
+            "pre_assessment": pre, "post_assessment": post
+        })
+    return participants
+
+
+def loop_kpis(participants: list[dict], cohort_id=None) -> dict:
+    """The KPIs computed one participant and question at a time, as the dashboard used to"""
+    if cohort_id:
+        participants = [p for p in participants if p["cohort"] == cohort_id]
+    complete = [p for p in participants if p["pre_assessment"] and p["post_assessment"]]
+    pre_only = len([p for p in participants if p["pre_assessment"] and not p["post_assessment"]])
+    total_improvement = 0
+    improved_count = 0
+    for p in complete:
+        total_improvement += (p["post_assessment"].average_score or 0) - (p["pre_assessment"].average_score or 0)
+        questions_improved = 0
+        for q in range(1, NUM_QUESTIONS + 1):
+            if p["post_assessment"].score(q) > p["pre_assessment"].score(q):
+                questions_improved += 1
+        if questions_improved >= MAJORITY:
+            improved_count += 1
+    return summarise(len(participants), len(complete), pre_only, total_improvement, improved_count)
+
+
+def _key(a: Assessment) -> str:
+    return f"{a.email}-{a.cohort}"
+
+
+def _rows(participants: list[dict]) -> dict[str, int]:
+    """Participant key -> row of the paired arrays"""
+    return {f"{p['email']}-{p['cohort']}": row for row, p in enumerate(participants)}
+
+
+def _submission(participants: list[dict]) -> tuple[list[dict], Assessment]:
+    """The participants after one more submission (a post-assessment for a random participant), and it"""
+    row = random.randrange(len(participants))
+    p = participants[row]
+    post = _assessment(10 * len(participants) + row, p["cohort"], "post", shift=1)
+    post.email = p["email"]
+    updated = list(participants)
+    updated[row] = dict(p, post_assessment=post)
+    return updated, post
+
+
+def _median_time(func, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _check(participants: list[dict], cohort_ids: list[str]) -> None:
+    """Fail loudly if the engine disagrees with the loop for any cohort"""
+    arrays = paired_arrays(participants)
+    updated, submission = _submission(participants)
+    extended, _ = extend_paired_arrays(arrays, _rows(participants), [submission], _key)
+    for expected_participants, results in ((participants, cohort_kpis(arrays)), (updated, cohort_kpis(extended))):
+        for cohort_id in [None] + cohort_ids:
+            expected, actual = loop_kpis(expected_participants, cohort_id), results[cohort_id]
+            for key, value in expected.items():
+                if abs(actual[key] - value) > 1e-6 * max(1, abs(value)):
+                    raise AssertionError(f"{key} for {cohort_id or 'all cohorts'}: loop {value}, engine {actual[key]}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the vectorised KPI engine")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES), help="Participants to generate")
+    parser.add_argument("--cohorts", type=int, default=12, help="Cohorts the participants are spread over")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per measurement (median reported)")
+    args = parser.parse_args()
+
+    cohort_ids = [f"cohort-{i + 1}" for i in range(args.cohorts)]
+    print(f"{'participants':>12} {'loop 1 ms':>10} {'loop all ms':>12} {'arrays ms':>10} {'version ms':>11} "
+          f"{'engine ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        participants = make_participants(size, args.cohorts)
+        _check(participants, cohort_ids)
+        arrays, rows = paired_arrays(participants), _rows(participants)
+        _, submission = _submission(participants)
+
+        loop_one = _median_time(lambda: loop_kpis(participants, cohort_ids[0]), args.repeats)
+        loop_all = _median_time(lambda: [loop_kpis(participants, c) for c in [None] + cohort_ids], args.repeats)
+        build = _median_time(lambda: paired_arrays(participants), args.repeats)
+        version = _median_time(
+            lambda: cohort_kpis(extend_paired_arrays(arrays, rows, [submission], _key)[0]), args.repeats
+        )
+        engine = _median_time(lambda: cohort_kpis(arrays), args.repeats)
+        print(f"{size:>12} {loop_one * 1000:>10.2f} {loop_all * 1000:>12.2f} {build * 1000:>10.2f} "
+              f"{version * 1000:>11.2f} {engine * 1000:>10.2f} {loop_one / version:>7.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Bulk import for NELFT Mentoring Assessment
+Validates historical assessments from CSV or JSONL and stores them in a single commit
+
+Usage:
+    python bulk_import.py assessments.csv
+    python bulk_import.py assessments.jsonl --dry-run
+
+CSV files have one row per assessment with columns name, email, cohort,
+assessment_type, q1-q12 (or 1-12), and optionally reflection1, reflection2 and
+submitted_at. JSONL records use the stored format, with responses as a dict
+keyed by question number. Cohorts may be given by id or by name.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import data_manager
+from records import NUM_QUESTIONS
+
+TYPE_ALIASES = {
+    "pre": "pre", "pre-programme": "pre", "pre-program": "pre",
+    "post": "post", "post-programme": "post", "post-program": "post"
+}
+
+
+class ImportReport(NamedTuple):
+    """Outcome of a bulk import"""
+    imported: int
+    rejected: list[tuple[int, str]]  # (row number, reason)
+    seconds: float
+    skipped: int = 0  # Valid rows repeating a stored assessment (or an earlier row), so not stored again
+
+    @property
+    def rows_per_second(self) -> float:
+        rows = self.imported + self.skipped + len(self.rejected)
+        return rows / self.seconds if self.seconds > 0 else float(rows)
+
+
+def read_rows(path: Path) -> Iterator[tuple[int, Optional[dict]]]:
+    """Yield (row number, raw row) from a CSV or JSONL file; the row is None if it cannot be parsed"""
+    if path.suffix.lower() == ".csv":
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            # Row 1 is the header
+            for row_number, row in enumerate(csv.DictReader(f), start=2):
+                yield row_number, row
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for row_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            yield row_number, row if isinstance(row, dict) else None
+
+
+def _responses(row: dict) -> dict[int, int]:
+    """Scores keyed by integer question id, from a responses dict or q1-q12 / 1-12 columns"""
+    source = row.get("responses")
+    if not isinstance(source, dict):
+        source = {k[1:] if k.lower().startswith("q") else k: v for k, v in row.items() if k}
+
+    responses = {}
+    for key, value in source.items():
+        try:
+            question = int(str(key).strip())
+        except ValueError:
+            continue
+        if not 1 <= question <= NUM_QUESTIONS or value in (None, ""):
+            continue
+        try:
+            score = int(float(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"question {question}: score {value!r} is not a number")
+        if score not in data_manager.RATING_LABELS:
+            raise ValueError(f"question {question}: score {score} is outside 1-5")
+        responses[question] = score
+
+    missing = [q for q in range(1, NUM_QUESTIONS + 1) if q not in responses]
+    if missing:
+        raise ValueError(f"missing scores for question(s) {', '.join(map(str, missing))}")
+    return responses
+
+
+def normalize_row(row: dict, cohort_ids: dict[str, str]) -> dict:
+    """Validate a raw row and convert it to an assessment record, raising ValueError with the reason"""
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is missing")
+
+    email = str(row.get("email") or "").strip().lower()
+    if "@" not in email:
+        raise ValueError(f"invalid email {email!r}")
+
+    cohort = str(row.get("cohort") or "").strip()
+    cohort_id = cohort_ids.get(cohort) or cohort_ids.get(cohort.lower())
+    if cohort_id is None:
+        raise ValueError(f"unknown cohort {cohort!r}")
+
+    assessment_type = TYPE_ALIASES.get(str(row.get("assessment_type") or "").strip().lower())
+    if assessment_type is None:
+        raise ValueError(f"assessment_type must be pre or post, not {row.get('assessment_type')!r}")
+
+    reflections = row.get("reflections")
+    if not isinstance(reflections, dict):
+        reflections = {}
+    assessment = {
+        "name": name,
+        "email": email,
+        "cohort": cohort_id,
+        "assessment_type": assessment_type,
+        "responses": _responses(row),
+        "reflections": {
+            "reflection1": str(reflections.get("reflection1", row.get("reflection1")) or ""),
+            "reflection2": str(reflections.get("reflection2", row.get("reflection2")) or "")
+        }
+    }
+
+    submitted_at = str(row.get("submitted_at") or "").strip()
+    if submitted_at:
+        try:
+            assessment["submitted_at"] = datetime.fromisoformat(submitted_at).isoformat()
+        except ValueError:
+            raise ValueError(f"submitted_at {submitted_at!r} is not an ISO date")
+    return assessment
+
+
+def import_rows(rows: Iterable[tuple[int, Optional[dict]]], dry_run: bool = False) -> ImportReport:
+    """Validate every row, then store the valid ones with a single commit"""
+    start = time.perf_counter()
+    cohort_ids = {}
+    for cohort in data_manager.load_cohorts():
+        cohort_ids[cohort.id] = cohort.id
+        cohort_ids[cohort.name.strip().lower()] = cohort.id
+
+    valid, rejected = [], []
+    for row_number, row in rows:
+        if row is None:
+            rejected.append((row_number, "not a valid record"))
+            continue
+        try:
+            valid.append(normalize_row(row, cohort_ids))
+        except ValueError as e:
+            rejected.append((row_number, str(e)))
+
+    # Allocate ids in submission order; rows without a date go last, stamped with the import time
+    valid.sort(key=lambda a: a.get("submitted_at", "\uffff"))
+    if dry_run:
+        return ImportReport(imported=len(valid), rejected=rejected, seconds=time.perf_counter() - start)
+
+    # A duplicate comes back as the record it repeats, so only ids that were not stored before are new
+    known = {a.id for a in data_manager.load_assessments()}
+    stored = {a.id for a in data_manager.add_assessments(valid)} - known
+    return ImportReport(imported=len(stored), rejected=rejected, seconds=time.perf_counter() - start,
+                        skipped=len(valid) - len(stored))
+
+
+def import_file(path: Path, dry_run: bool = False) -> ImportReport:
+    """Import assessments from a CSV or JSONL file"""
+    return import_rows(read_rows(path), dry_run)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk import assessments from CSV or JSONL")
+    parser.add_argument("path", type=Path, help="CSV or JSONL file to import")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only; do not store anything")
+    args = parser.parse_args()
+
+    report = import_file(args.path, args.dry_run)
+    action = "Validated" if args.dry_run else "Imported"
+    print(f"{action} {report.imported} rows in {report.seconds:.2f}s ({report.rows_per_second:,.0f} rows/s)")
+    if report.skipped:
+        print(f"Skipped {report.skipped} duplicate rows")
+    if report.rejected:
+        print(f"Rejected {len(report.rejected)} rows:")
+        for row_number, reason in report.rejected:
+            print(f"  row {row_number}: {reason}")
+    return 1 if report.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
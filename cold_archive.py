@@ -0,0 +1,107 @@
+"""
+Cold archive for NELFT Mentoring Assessment
+Keeps inactive cohorts' assessments in compressed JSONL files that are only read when that cohort is viewed
+"""
+
+import gzip
+import json
+import lzma
+import threading
+from pathlib import Path
+from typing import Iterator, Optional
+
+import jsonl_store
+from records import Assessment
+from shard_store import shard_name
+
+# Compression name -> (file suffix, module providing compress() and open())
+COMPRESSIONS = {
+    "gzip": (".jsonl.gz", gzip),
+    "lzma": (".jsonl.xz", lzma)
+}
+
+
+class ColdArchive:
+    """One compressed JSONL file per archived cohort.
+
+    Archived records are out of the hot working set: nothing reads them until a
+    cohort is asked for by id, and they are then cached (by file stat) so later
+    reruns of the dashboard do not decompress them again.
+    """
+
+    def __init__(self, directory: Path, compression: str = "gzip"):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown archive compression {compression!r}; use one of {', '.join(COMPRESSIONS)}")
+        self.directory = directory
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._cache: dict[str, tuple] = {}
+
+    def path(self, cohort_id: str) -> Optional[Path]:
+        """The cohort's archive file, in whichever compression it was written, or None"""
+        for suffix, _ in COMPRESSIONS.values():
+            path = self.directory / f"{shard_name(cohort_id)}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def is_archived(self, cohort_id: Optional[str]) -> bool:
+        """Check whether a cohort has an archive file"""
+        return bool(cohort_id) and self.path(cohort_id) is not None
+
+    def write(self, cohort_id: str, records: list[dict]) -> None:
+        """Atomically replace the cohort's archive with these records"""
+        suffix, module = COMPRESSIONS[self.compression]
+        data = b"".join((json.dumps(r, separators=(",", ":")) + "\n").encode("utf-8") for r in records)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{shard_name(cohort_id)}{suffix}"
+        jsonl_store.atomic_write(path, module.compress(data))
+
+        # Drop a copy left in the other compression format
+        for other_suffix, _ in COMPRESSIONS.values():
+            if other_suffix != suffix:
+                (self.directory / f"{shard_name(cohort_id)}{other_suffix}").unlink(missing_ok=True)
+
+    def remove(self, cohort_id: str) -> None:
+        """Delete the cohort's archive"""
+        for suffix, _ in COMPRESSIONS.values():
+            (self.directory / f"{shard_name(cohort_id)}{suffix}").unlink(missing_ok=True)
+
+    def iter_records(self, cohort_id: str) -> Iterator[dict]:
+        """Stream the cohort's archived records, decompressing as they are read"""
+        path = self.path(cohort_id)
+        if path is not None:
+            yield from self._iter_file(path)
+
+    def iter_all_records(self) -> Iterator[dict]:
+        """Stream the records of every archived cohort"""
+        if not self.directory.exists():
+            return
+        for suffix, _ in COMPRESSIONS.values():
+            for path in sorted(self.directory.glob(f"*{suffix}")):
+                yield from self._iter_file(path)
+
+    @staticmethod
+    def _iter_file(path: Path) -> Iterator[dict]:
+        module = gzip if path.suffix == ".gz" else lzma
+        with module.open(path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def load(self, cohort_id: str) -> list[Assessment]:
+        """The cohort's archived assessments, decompressed on first use and then cached"""
+        path = self.path(cohort_id)
+        if path is None:
+            return []
+
+        stat = path.stat()
+        signature = (str(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._cache.get(cohort_id)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            assessments = [Assessment.from_dict(r) for r in self.iter_records(cohort_id)]
+            self._cache[cohort_id] = (signature, assessments)
+            return assessments
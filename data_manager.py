@@ -3,23 +3,81 @@ Data management for NELFT Mentoring Assessment
 Handles storage and retrieval of cohorts and assessments
 """
 
+import atexit
+import heapq
+import itertools
 import json
 import os
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional
 import streamlit as st
 
-# Data directory
-DATA_DIR = Path(__file__).parent / "data"
+import jsonl_store
+from cold_archive import ColdArchive
+from records import Assessment, Cohort, CohortRegistry, id_number, normalize_record
+from response_matrix import ResponseArrays, from_records
+from snapshots import AssessmentSnapshot, Changes, SnapshotHistory
+from submission_index import SubmissionIndex
+from storage_backends import (
+    AssessmentBackend, JsonBackend, JsonlBackend, RemoteBackend, SqliteBackend, pair_assessments
+)
+
+# Data directory (override with ASSESSMENT_DATA_DIR, e.g. to point at a persistent volume)
+DATA_DIR = Path(os.environ.get("ASSESSMENT_DATA_DIR", Path(__file__).parent / "data"))
 COHORTS_FILE = DATA_DIR / "cohorts.json"
-ASSESSMENTS_FILE = DATA_DIR / "assessments.json"
+SHARDS_DIR = DATA_DIR / "assessments"  # One sub-directory per cohort
+ASSESSMENTS_FILE = DATA_DIR / "assessments.json"  # Legacy single-file stores, migrated on first use
+ASSESSMENTS_LOG = DATA_DIR / "assessments.jsonl"
+ASSESSMENTS_DB = DATA_DIR / "assessments.db"
+SEQUENCES_FILE = DATA_DIR / "sequences.json"
+RESPONSE_MATRIX_DIR = DATA_DIR / "responses"  # SQLite backend only; shards keep their own
+ARCHIVE_DIR = DATA_DIR / "archive"  # Compressed assessments of archived (inactive) cohorts
+
+# Assessment storage backend: "jsonl" (default), "sqlite" or "json" (see storage_backends)
+STORAGE_BACKEND = os.environ.get("ASSESSMENT_STORAGE", "jsonl").lower()
+
+# Address of a storage daemon that owns the assessment files (see storage_daemon.py); unset to open them directly
+STORAGE_SERVER = os.environ.get("ASSESSMENT_STORAGE_SERVER", "")
+
+# Compression for archived cohorts: "gzip" or "lzma" (smaller, slower)
+ARCHIVE_COMPRESSION = os.environ.get("ASSESSMENT_ARCHIVE_COMPRESSION", "gzip").lower()
+
+# Seconds between background compactions of the assessment store (0 disables them)
+COMPACTION_INTERVAL = float(os.environ.get("ASSESSMENT_COMPACTION_INTERVAL", "300"))
+# A shard is only re-snapshotted once its log has grown by this many bytes
+COMPACTION_MIN_BYTES = 256 * 1024
 
 # Ensure data directory exists
 DATA_DIR.mkdir(exist_ok=True)
 
 
-def load_cohorts() -> list[dict]:
+def _allocate_ids(sequence: str, count: int, existing_ids: Callable[[], Iterable[str]]) -> list[int]:
+    """Reserve the next `count` numbers from a persisted, lock-protected sequence.
+    
+    Numbers are never reused, even after records are deleted, and increase in
+    allocation order. A sequence missing from the file is seeded once from the
+    highest id in `existing_ids()`.
+    """
+    with jsonl_store.file_lock(SEQUENCES_FILE):
+        sequences = {}
+        if SEQUENCES_FILE.exists():
+            with open(SEQUENCES_FILE, "r") as f:
+                sequences = json.load(f)
+        
+        if sequence not in sequences:
+            sequences[sequence] = max((id_number(record_id) for record_id in existing_ids()), default=0)
+        
+        start = sequences[sequence] + 1
+        sequences[sequence] += count
+        jsonl_store.atomic_write_json(SEQUENCES_FILE, sequences)
+    return list(range(start, start + count))
+
+
+def load_cohorts() -> list[Cohort]:
     """Load all cohorts from storage"""
     if not COHORTS_FILE.exists():
         # Create default cohorts
@@ -43,60 +101,212 @@ def load_cohorts() -> list[dict]:
                 "start_date": "2025-09-01"
             }
         ]
-        save_cohorts(default_cohorts)
-        return default_cohorts
+        cohorts = [Cohort.from_dict(c) for c in default_cohorts]
+        save_cohorts(cohorts)
+        return cohorts
     
     with open(COHORTS_FILE, "r") as f:
-        return json.load(f)
+        return [Cohort.from_dict(c) for c in json.load(f)]
 
 
-def save_cohorts(cohorts: list[dict]) -> None:
-    """Save cohorts to storage"""
-    with open(COHORTS_FILE, "w") as f:
-        json.dump(cohorts, f, indent=2)
+def save_cohorts(cohorts: list[Cohort]) -> None:
+    """Save cohorts to storage (atomically, so readers never see a partial file)"""
+    global _cohort_registry
+    jsonl_store.atomic_write_json(COHORTS_FILE, [c.to_dict() for c in cohorts])
+    with _cohort_registry_lock:
+        _cohort_registry = None
 
 
-def add_cohort(name: str, start_date: str) -> dict:
+def add_cohort(name: str, start_date: str) -> Cohort:
     """Add a new cohort"""
-    cohorts = load_cohorts()
-    new_cohort = {
-        "id": f"cohort-{len(cohorts) + 1}",
-        "name": name,
-        "active": True,
-        "start_date": start_date
-    }
-    cohorts.append(new_cohort)
-    save_cohorts(cohorts)
+    with jsonl_store.file_lock(COHORTS_FILE):
+        cohorts = load_cohorts()
+        (number,) = _allocate_ids("cohort", 1, lambda: [c.id for c in cohorts])
+        new_cohort = Cohort(
+            id=f"cohort-{number}",
+            name=name,
+            active=True,
+            start_date=start_date
+        )
+        cohorts.append(new_cohort)
+        save_cohorts(cohorts)
     return new_cohort
 
 
-def get_active_cohorts() -> list[dict]:
-    """Get only active cohorts"""
-    return [c for c in load_cohorts() if c.get("active", True)]
+_cohort_registry: Optional[tuple] = None  # (cohorts.json stat, CohortRegistry)
+_cohort_registry_lock = threading.Lock()
 
 
-def load_assessments() -> list[dict]:
-    """Load all assessments from storage"""
-    if not ASSESSMENTS_FILE.exists():
-        save_assessments([])
-        return []
+def get_cohort_registry() -> CohortRegistry:
+    """Cached cohort lookups (by id, by name, active list, short names), shared by every session.
+    
+    Rebuilt after save_cohorts or add_cohort, or when cohorts.json is changed
+    by hand or by another process; otherwise a rerun costs one stat call.
+    """
+    global _cohort_registry
+    stat = jsonl_store.file_stat(COHORTS_FILE)
+    with _cohort_registry_lock:
+        cached = _cohort_registry
+    if cached is not None and stat is not None and cached[0] == stat:
+        return cached[1]
+    
+    # Loaded without the lock: load_cohorts may create the file through save_cohorts, which takes it
+    registry = CohortRegistry(load_cohorts())
+    with _cohort_registry_lock:
+        # Keyed on the pre-read stat so a change made mid-load is seen next time
+        _cohort_registry = (stat, registry)
+    return registry
+
+
+def get_active_cohorts() -> list[Cohort]:
+    """Get only active cohorts (from the cached registry; do not modify them)"""
+    return list(get_cohort_registry().active)
+
+
+BACKENDS = ("json", "jsonl", "sqlite")
+
+
+def _create_backend(name: str) -> AssessmentBackend:
+    """Create the assessment storage backend with the given name"""
+    jsonl = JsonlBackend(SHARDS_DIR, (ASSESSMENTS_LOG, ASSESSMENTS_FILE))
+    if name == "jsonl":
+        return jsonl
+    if name == "sqlite":
+        # A new database is filled from the JSONL shards (migrating a legacy single-file store first)
+        return SqliteBackend(ASSESSMENTS_DB, RESPONSE_MATRIX_DIR, lambda: [a.to_dict() for a in jsonl.load()])
+    if name == "json":
+        return JsonBackend(ASSESSMENTS_FILE)
+    raise ValueError(f"Unknown assessment storage {name!r}; use one of {', '.join(BACKENDS)}")
+
+
+_backend = RemoteBackend(STORAGE_SERVER) if STORAGE_SERVER else _create_backend(STORAGE_BACKEND)
+_archive = ColdArchive(ARCHIVE_DIR, ARCHIVE_COMPRESSION)
+
+
+def load_assessments() -> list[Assessment]:
+    """Load all assessments (served from shared in-memory caches)"""
+    _start_compactor()
+    return list(_backend.load())
+
+
+def save_assessments(assessments: list[Assessment]) -> None:
+    """Replace all stored assessments"""
+    _backend.save([a.to_dict() for a in assessments])
+
+
+_submissions = SubmissionIndex()
+
+
+def _stored_assessment_ids() -> Iterator[str]:
+    """Ids of every stored assessment, archived ones included, for seeding the assessment sequence"""
+    for assessment in load_assessments():
+        yield assessment.id
+    for record in _archive.iter_all_records():
+        yield record.get("id")
+
+
+def _assign_assessment_ids(batch: list[dict]) -> list[dict]:
+    """Give each new assessment in a batch the next id from the assessment sequence; returns those to store.
+    
+    Runs under the writer lock. A repeat of a stored submission (the same
+    idempotency key, or the same email, cohort, type and responses), or of one
+    earlier in the batch, is not stored again: it is filled in from the
+    original record, so its caller gets the assessment that was saved.
+    """
+    originals = _submissions.find(batch, read_snapshot(), get_changes)
+    new = [a for a, original in zip(batch, originals) if original is None]
+    if new:
+        numbers = _allocate_ids("assessment", len(new), _stored_assessment_ids)
+        for assessment, number in zip(new, numbers):
+            assessment["id"] = f"assessment-{number}"
+    
+    for assessment, original in zip(batch, originals):
+        if original is not None:
+            assessment.update(original.to_dict() if isinstance(original, Assessment) else original)
+    return new
+
+
+def _commit_assessments(batch: list[dict]) -> list[dict]:
+    """Write a batch of new assessments in one commit (one locked append and fsync per JSONL shard)"""
+    return _backend.add(batch, _assign_assessment_ids)
+
+
+def get_response_matrix(cohort_id: Optional[str] = None) -> ResponseArrays:
+    """Stored responses as memory-mapped NumPy columns (see response_matrix.ResponseArrays).
+    
+    With a cohort id the JSONL backend maps only that cohort's shard; other
+    rows may still be present, so filter with ResponseArrays.cohort_mask. An
+    archived cohort's arrays are built in memory from its cold file.
+    """
+    if is_cohort_archived(cohort_id):
+        return from_records([a.to_dict() for a in get_assessments_by_cohort(cohort_id)])
+    return _backend.response_arrays(cohort_id)
+
+
+def compact_assessments(min_tail_bytes: int = 0) -> int:
+    """Fold recent submissions into the compacted store without blocking writers.
     
-    with open(ASSESSMENTS_FILE, "r") as f:
-        return json.load(f)
+    JSONL shards get a fresh snapshot of their log, so a cold load reads the
+    snapshot plus a short tail; SQLite checkpoints its write-ahead log into the
+    database; the JSON file has nothing to compact. Returns the number of
+    shards (or databases) compacted.
+    """
+    return _backend.compact(min_tail_bytes)
+
+
+def _compaction_loop() -> None:
+    while True:
+        time.sleep(COMPACTION_INTERVAL)
+        try:
+            compact_assessments(COMPACTION_MIN_BYTES)
+        except Exception:
+            # Compaction is an optimisation; the log stays authoritative, so retry next time
+            pass
+
+
+_compactor_started = False
+_compactor_lock = threading.Lock()
+
 
+def _start_compactor() -> None:
+    """Start the background compaction thread once per process"""
+    global _compactor_started
+    if COMPACTION_INTERVAL <= 0 or STORAGE_SERVER:
+        # A storage daemon compacts its own files
+        return
+    with _compactor_lock:
+        if not _compactor_started:
+            threading.Thread(target=_compaction_loop, name="assessment-compactor", daemon=True).start()
+            _compactor_started = True
 
-def save_assessments(assessments: list[dict]) -> None:
-    """Save assessments to storage"""
-    with open(ASSESSMENTS_FILE, "w") as f:
-        json.dump(assessments, f, indent=2)
 
+# Submissions arriving within this window are written as one group commit
+GROUP_COMMIT_WINDOW = 0.005
+# Seconds to wait at shutdown for queued submissions to reach disk
+SHUTDOWN_FLUSH_TIMEOUT = 30
 
-def add_assessment(assessment: dict) -> dict:
-    """Add a new assessment submission"""
-    assessments = load_assessments()
+
+def _commit_submissions(batch: list[dict]) -> list[Assessment]:
+    return [Assessment.from_dict(a) for a in _commit_assessments(batch)]
+
+
+_writer = jsonl_store.BackgroundWriter(_commit_submissions, GROUP_COMMIT_WINDOW, name="assessment-writer")
+atexit.register(_writer.flush, SHUTDOWN_FLUSH_TIMEOUT)
+
+
+def submit_assessment(assessment: dict) -> Future:
+    """Queue a new assessment submission for the background writer and return immediately.
+    
+    The dict is completed in place (submitted_at, average_score, canonical
+    responses) so it can be shown straight away; the writer thread gets its
+    own copy, so the caller's dict is never changed after this returns. The
+    Future resolves to the saved Assessment, with its id, once the batch
+    holding it has been written and fsynced, or raises the error that stopped
+    it being saved.
+    """
+    _start_compactor()
     
     # Add metadata
-    assessment["id"] = f"assessment-{len(assessments) + 1}"
     assessment["submitted_at"] = datetime.now().isoformat()
     
     # Calculate average score
@@ -104,53 +314,244 @@ def add_assessment(assessment: dict) -> dict:
     if responses:
         assessment["average_score"] = sum(responses.values()) / len(responses)
     
-    assessments.append(assessment)
-    save_assessments(assessments)
-    return assessment
+    # Store responses in canonical form so every later load takes the fast decode path
+    normalize_record(assessment)
+    
+    return _writer.submit(dict(assessment))
+
 
+def add_assessment(assessment: dict) -> Assessment:
+    """Add a new assessment submission and wait until it is saved (batched with concurrent submissions)"""
+    return submit_assessment(assessment).result()
 
-def find_pre_assessment(email: str, cohort: str) -> Optional[dict]:
-    """Find a pre-assessment for matching"""
-    assessments = load_assessments()
-    email_lower = email.lower().strip()
+
+def add_assessments(assessments: list[dict]) -> list[Assessment]:
+    """Add many assessments at once (e.g. a historical backfill) in a single commit.
     
-    for a in assessments:
-        if (a.get("email", "").lower().strip() == email_lower and 
-            a.get("cohort") == cohort and 
-            a.get("assessment_type") == "pre"):
-            return a
+    Records keep any submitted_at they already have; average_score is computed
+    as for add_assessment. Ids are allocated in the order given.
+    """
+    now = datetime.now().isoformat()
+    for assessment in assessments:
+        assessment.setdefault("submitted_at", now)
+        responses = assessment.get("responses", {})
+        if responses:
+            assessment["average_score"] = sum(responses.values()) / len(responses)
+        normalize_record(assessment)
     
-    return None
+    if not assessments:
+        return []
+    return [Assessment.from_dict(a) for a in _commit_assessments(assessments)]
 
 
-def get_assessments_by_cohort(cohort_id: str) -> list[dict]:
-    """Get all assessments for a specific cohort"""
-    return [a for a in load_assessments() if a.get("cohort") == cohort_id]
+def find_pre_assessment(email: str, cohort: str) -> Optional[Assessment]:
+    """Find a pre-assessment for matching (an index lookup on the JSONL and SQLite backends)"""
+    pre = _backend.find_pre(email, cohort)
+    if pre is None and is_cohort_archived(cohort):
+        email_lower = email.lower().strip()
+        for a in _archive.load(cohort):
+            if a.email.lower().strip() == email_lower and a.is_pre:
+                return a
+    return pre
 
 
-def get_participant_data() -> list[dict]:
-    """Build participant list with pre/post matching"""
-    assessments = load_assessments()
-    participants = {}
+def get_assessments_by_cohort(cohort_id: str) -> list[Assessment]:
+    """Get all assessments for a specific cohort (reads only that cohort's shard, or its archive)"""
+    hot = _backend.by_cohort(cohort_id)
+    if not is_cohort_archived(cohort_id):
+        return hot
     
-    for a in assessments:
-        key = f"{a.get('email', '').lower().strip()}-{a.get('cohort')}"
-        
-        if key not in participants:
-            participants[key] = {
-                "name": a.get("name"),
-                "email": a.get("email"),
-                "cohort": a.get("cohort"),
-                "pre_assessment": None,
-                "post_assessment": None
-            }
-        
-        if a.get("assessment_type") == "pre":
-            participants[key]["pre_assessment"] = a
-        else:
-            participants[key]["post_assessment"] = a
+    cold = _archive.load(cohort_id)
+    cold_ids = {a.id for a in cold}
+    return cold + [a for a in hot if a.id not in cold_ids]
+
+
+def iter_assessments() -> Iterator[Assessment]:
+    """Stream every assessment in id order straight from storage, one at a time.
+    
+    Unlike load_assessments this neither builds nor reuses the in-memory cache
+    (except on the JSON backend, which has to parse the whole file anyway), so
+    exports and aggregations over large archives run in bounded memory.
+    Archived cohorts are not included; use iter_assessments_by_cohort for those.
+    """
+    yield from _backend.iter_all()
+
+
+def iter_assessments_by_cohort(cohort_id: str) -> Iterator[Assessment]:
+    """Stream one cohort's assessments straight from storage (its archive first), one at a time"""
+    cold_ids = set()
+    for record in _archive.iter_records(cohort_id):
+        cold_ids.add(record.get("id"))
+        yield Assessment.from_dict(record)
+    
+    for a in _backend.iter_cohort(cohort_id):
+        if a.id not in cold_ids:
+            yield a
+
+
+def get_recent_assessments(cohort_id: Optional[str] = None, limit: int = 10) -> list[Assessment]:
+    """Get the most recent submissions, optionally for a single cohort"""
+    if not is_cohort_archived(cohort_id):
+        return _backend.recent(cohort_id, limit)
     
-    return list(participants.values())
+    # Latest submission time first; backfilled history can carry newer ids than live submissions
+    return heapq.nlargest(
+        limit, get_assessments_by_cohort(cohort_id), key=lambda a: (a.submitted_at or "", id_number(a.id))
+    )
+
+
+def get_participant_data(include_archived: Iterable[str] = ()) -> list[dict]:
+    """Build participant list with pre/post matching, read from the materialised pairing view.
+    
+    Each participant is a dict with name, email, cohort and the pre_assessment /
+    post_assessment Assessment objects (None where not yet submitted). Archived
+    cohorts are left out unless named in include_archived, in which case they
+    are paired from their cold files.
+    """
+    _start_compactor()
+    participants = _backend.participants()
+    
+    archived = {c for c in include_archived if is_cohort_archived(c)}
+    if archived:
+        participants = [p for p in participants if p["cohort"] not in archived]
+        for cohort_id in sorted(archived):
+            participants.extend(pair_assessments(get_assessments_by_cohort(cohort_id)))
+    return participants
+
+
+_history = SnapshotHistory(_backend.response_arrays)
+
+
+def read_snapshot(include_archived: Iterable[str] = ()) -> AssessmentSnapshot:
+    """An immutable, versioned view of the assessments for reports and exports (see snapshots.AssessmentSnapshot).
+    
+    Every read made through the snapshot sees the same data version, however
+    many submissions are saved meanwhile, and never waits on a writer. A new
+    version is only taken when the stored data has changed, so sessions share
+    its derived pairing and arrays. Archived cohorts named in include_archived
+    are added from their cold files.
+    """
+    _start_compactor()
+    snapshot = _history.take(_backend.load())
+    return snapshot.including({c: _archive.load(c) for c in include_archived if is_cohort_archived(c)})
+
+
+def data_version() -> int:
+    """The current data version, which increases whenever the stored assessments change"""
+    return read_snapshot().version
+
+
+def get_changes(since_version: int, snapshot: Optional[AssessmentSnapshot] = None) -> Changes:
+    """Assessments added after since_version, up to `snapshot` (by default the latest data).
+    
+    Consumers keep the version they last applied and fold in only `added`.
+    When `reset` is set (a cohort was archived or restored, the data was
+    replaced, or since_version is too old or from another process) they must
+    rebuild from the snapshot instead. Archived cohorts are not in the feed.
+    """
+    return _history.changes(since_version, snapshot or read_snapshot())
+
+
+# Seconds between checks for new data versions while there are subscribers
+FEED_POLL_INTERVAL = 1.0
+
+_subscribers: dict[int, list] = {}  # Subscription id -> [callback, last version delivered]
+_subscribers_lock = threading.Lock()
+_subscription_ids = itertools.count(1)
+_feed_started = False
+
+
+def _feed_loop() -> None:
+    while True:
+        time.sleep(FEED_POLL_INTERVAL)
+        with _subscribers_lock:
+            subscriptions = list(_subscribers.values())
+        if not subscriptions:
+            continue
+        try:
+            snapshot = read_snapshot()
+        except Exception:
+            # Storage unavailable for the moment; try again next time
+            continue
+        for subscription in subscriptions:
+            callback, version = subscription
+            if version == snapshot.version:
+                continue
+            subscription[1] = snapshot.version
+            try:
+                callback(get_changes(version, snapshot))
+            except Exception:
+                # One failing subscriber must not stop the others being notified
+                pass
+
+
+def subscribe(callback: Callable[[Changes], None], since_version: Optional[int] = None) -> Callable[[], None]:
+    """Call callback(changes) from a background thread each time a new data version appears.
+    
+    Delivery starts after since_version (default: the current version) and
+    each call carries everything since the previous one. Returns a function
+    that cancels the subscription.
+    """
+    global _feed_started
+    if since_version is None:
+        since_version = data_version()
+    with _subscribers_lock:
+        subscription_id = next(_subscription_ids)
+        _subscribers[subscription_id] = [callback, since_version]
+        if not _feed_started:
+            threading.Thread(target=_feed_loop, name="assessment-change-feed", daemon=True).start()
+            _feed_started = True
+    
+    def unsubscribe() -> None:
+        with _subscribers_lock:
+            _subscribers.pop(subscription_id, None)
+    return unsubscribe
+
+
+def is_cohort_archived(cohort_id: Optional[str]) -> bool:
+    """Check whether a cohort's assessments have been moved to the cold archive"""
+    return _archive.is_archived(cohort_id)
+
+
+def _archive_records(cohort_id: str, records: list[dict]) -> None:
+    """Add records to a cohort's archive file, skipping any it already holds"""
+    existing = list(_archive.iter_records(cohort_id))
+    existing_ids = {r.get("id") for r in existing}
+    _archive.write(cohort_id, existing + [r for r in records if r.get("id") not in existing_ids])
+
+
+def archive_cohort(cohort_id: str) -> int:
+    """Move a cohort's assessments from the hot store into its compressed archive file.
+    
+    The archive is written (and fsynced) before the hot copy is removed, so an
+    interruption leaves the records in both places rather than neither; reads
+    de-duplicate by id. Returns the number of assessments moved.
+    """
+    if not STORAGE_SERVER:
+        # Seed the id sequence while the cohort's ids are still hot, so they are never issued again
+        _allocate_ids("assessment", 0, _stored_assessment_ids)
+    return _backend.take_cohort(cohort_id, lambda records: _archive_records(cohort_id, records))
+
+
+def archive_inactive_cohorts() -> list[str]:
+    """Archive every inactive cohort that still has assessments in the hot store; returns their ids"""
+    return [c.id for c in load_cohorts() if not c.active and archive_cohort(c.id)]
+
+
+def _renumber_assessments(records: list[dict]) -> list[dict]:
+    """Give restored records whose ids are now held by other assessments new ids from the sequence"""
+    numbers = _allocate_ids("assessment", len(records), _stored_assessment_ids)
+    for record, number in zip(records, numbers):
+        record["id"] = f"assessment-{number}"
+    return records
+
+
+def restore_cohort(cohort_id: str) -> int:
+    """Move an archived cohort's assessments back into the hot store; returns how many were restored"""
+    restored = _backend.put_cohort(cohort_id, list(_archive.iter_records(cohort_id)), _renumber_assessments)
+    # Removed only once the records are back, so an interruption leaves them in both places
+    _archive.remove(cohort_id)
+    return restored
 
 
 # Questions data
@@ -0,0 +1,233 @@
+"""
+Data exports for NELFT Mentoring Assessment
+Writes participant results as CSV in chunks, so large exports never build the whole file as one string,
+and the response matrix as typed columnar files for BI tools
+
+Usage:
+    python exports.py participants participants_export.csv [--cohort cohort-1] [--status Complete]
+    python exports.py columnar assessments.arrow [--cohort cohort-1]
+
+Columnar exports are Arrow IPC (.arrow/.feather) or Parquet (.parquet) when
+pyarrow is installed, with one row per assessment and columns id, name, email,
+cohort, assessment_type, submitted_at, average_score and q1-q12 (uint8).
+submitted_at is a UTC timestamp: stored submission times have no zone and are
+taken as the server's local time, then converted to UTC.
+Without pyarrow they are written as an uncompressed NumPy .npz bundle:
+
+    responses       (N, 12) uint8   question scores, 0 = not answered
+    ids             (N,) uint32     numeric part of the assessment id
+    types           (N,) uint8      0 = pre, 1 = post
+    cohorts         (N,) uint16     index into cohort_ids
+    cohort_ids      (C,) str
+    timestamps      (N,) int64      submission time, seconds since the epoch (UTC; the
+                                    stored local times are read in the server's zone)
+    average_scores  (N,) float32    NaN where not recorded
+    names, emails   (N,) str
+    format          ()   str        "nelft-assessments-npz/1"
+
+Load it with numpy.load(path) (no pickle needed).
+"""
+
+import argparse
+import csv
+import io
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+import data_manager
+from records import NUM_QUESTIONS, CohortRegistry
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+except ImportError:  # Columnar exports fall back to NumPy .npz
+    pa = None
+
+NPZ_FORMAT = "nelft-assessments-npz/1"
+# Format used for columnar downloads from the dashboard
+COLUMNAR_SUFFIX = ".arrow" if pa is not None else ".npz"
+
+STATUS_FILTERS = ("All", "Complete", "Pre Only")
+
+PARTICIPANT_COLUMNS = (
+    ["Name", "Email", "Cohort", "Pre Score", "Post Score", "Change", "Pre Submitted", "Post Submitted"]
+    + [f"Pre Q{q}" for q in range(1, NUM_QUESTIONS + 1)]
+    + [f"Post Q{q}" for q in range(1, NUM_QUESTIONS + 1)]
+)
+
+
+def _participant_row(p: dict, cohorts: CohortRegistry) -> list:
+    """One CSV row: the Participants table columns followed by every pre and post question score"""
+    pre, post = p["pre_assessment"], p["post_assessment"]
+    pre_score = pre.average_score or 0 if pre else None
+    post_score = post.average_score or 0 if post else None
+    change = post_score - pre_score if pre_score is not None and post_score is not None else None
+    return [
+        p.get("name", ""),
+        p.get("email", ""),
+        cohorts.short_name(p["cohort"]) or "",
+        f"{pre_score:.2f}" if pre_score else "—",
+        f"{post_score:.2f}" if post_score else "—",
+        f"{change:+.2f}" if change is not None else "—",
+        pre.submitted_at if pre else "",
+        post.submitted_at if post else ""
+    ] + list(pre.responses if pre else [""] * NUM_QUESTIONS) + list(post.responses if post else [""] * NUM_QUESTIONS)
+
+
+def iter_participants_csv(cohort_id: Optional[str] = None, status: str = "All",
+                          chunk_rows: int = 1000) -> Iterator[bytes]:
+    """Yield the participants export as UTF-8 CSV, `chunk_rows` rows at a time.
+
+    Rows are formatted straight from the stored participant pairing, so only
+    one chunk of CSV text exists at a time however many participants there are.
+    The export reads one snapshot, so submissions made while it runs are left out.
+    """
+    cohorts = data_manager.get_cohort_registry()
+    snapshot = data_manager.read_snapshot(include_archived=[cohort_id] if cohort_id else [])
+    participants = snapshot.get_participant_data()
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(PARTICIPANT_COLUMNS)
+    rows = 0
+    for p in participants:
+        if cohort_id and p["cohort"] != cohort_id:
+            continue
+        if status == "Complete" and not (p["pre_assessment"] and p["post_assessment"]):
+            continue
+        if status == "Pre Only" and not (p["pre_assessment"] and not p["post_assessment"]):
+            continue
+
+        writer.writerow(_participant_row(p, cohorts))
+        rows += 1
+        if rows % chunk_rows == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode("utf-8")
+
+
+def participants_csv_bytes(cohort_id: Optional[str] = None, status: str = "All") -> bytes:
+    """The whole participants export as bytes, for st.download_button.
+
+    The file is held in memory in full; large exports should use
+    `python exports.py participants`, which streams the chunks to disk.
+    """
+    return b"".join(iter_participants_csv(cohort_id, status))
+
+
+def columnar_arrays(cohort_id: Optional[str] = None) -> dict[str, np.ndarray]:
+    """Response matrix columns plus per-assessment metadata, one row per assessment (npz layout)"""
+    # Matrix rows and metadata come from the same snapshot, so every row has its record
+    snapshot = data_manager.read_snapshot(include_archived=[cohort_id] if cohort_id else [])
+    arrays = snapshot.get_response_matrix(cohort_id)
+    mask = arrays.cohort_mask(cohort_id)
+    ids = np.asarray(arrays.ids[mask])
+
+    # Metadata that is not in the matrix, joined on the numeric assessment id
+    assessments = snapshot.get_assessments_by_cohort(cohort_id) if cohort_id else snapshot.assessments
+    by_id = {a.id: a for a in assessments}
+    rows = [by_id.get(f"assessment-{n}") for n in ids.tolist()]
+
+    return {
+        "responses": np.asarray(arrays.responses[mask]),
+        "ids": ids,
+        "types": np.asarray(arrays.types[mask]),
+        "cohorts": np.asarray(arrays.cohorts[mask]),
+        "cohort_ids": np.array(arrays.cohort_ids, dtype=str),
+        "timestamps": np.asarray(arrays.timestamps[mask]),
+        "average_scores": np.array(
+            [a.average_score if a and a.average_score is not None else np.nan for a in rows], dtype=np.float32
+        ),
+        "names": np.array([a.name if a else "" for a in rows], dtype=str),
+        "emails": np.array([a.email if a else "" for a in rows], dtype=str),
+        "format": np.array(NPZ_FORMAT)
+    }
+
+
+def _arrow_table(columns: dict[str, np.ndarray]):
+    """The npz columns as an Arrow table with one scalar column per question"""
+    cohorts = pa.DictionaryArray.from_arrays(columns["cohorts"], pa.array(columns["cohort_ids"].tolist()))
+    # Type codes are TYPE_PRE = 0 and TYPE_POST = 1, so they index the dictionary directly
+    types = pa.DictionaryArray.from_arrays(columns["types"].astype(np.int8), pa.array(["pre", "post"]))
+    fields = {
+        "id": pa.array([f"assessment-{n}" for n in columns["ids"].tolist()]),
+        "name": pa.array(columns["names"].tolist()),
+        "email": pa.array(columns["emails"].tolist()),
+        "cohort": cohorts,
+        "assessment_type": types,
+        # The epochs are instants, so the column says so; a zone-less timestamp would read as UTC wall time
+        "submitted_at": pa.array(columns["timestamps"], type=pa.timestamp("s", tz="UTC")),
+        "average_score": pa.array(columns["average_scores"], from_pandas=True)
+    }
+    for q in range(NUM_QUESTIONS):
+        fields[f"q{q + 1}"] = pa.array(np.ascontiguousarray(columns["responses"][:, q]))
+    return pa.table(fields)
+
+
+def export_columnar(path: Path, cohort_id: Optional[str] = None) -> Path:
+    """Write assessments in a typed columnar format chosen by the file suffix; returns the path written.
+
+    .arrow/.feather (Arrow IPC, uncompressed so readers can memory-map it) and
+    .parquet need pyarrow; without it, or for any other suffix, an .npz bundle
+    is written instead.
+    """
+    columns = columnar_arrays(cohort_id)
+    suffix = path.suffix.lower()
+    if pa is not None and suffix in (".arrow", ".feather", ".parquet"):
+        table = _arrow_table(columns)
+        if suffix == ".parquet":
+            parquet.write_table(table, path)
+        else:
+            feather.write_feather(table, path, compression="uncompressed")
+        return path
+
+    path = path.with_suffix(".npz")
+    np.savez(path, **columns)
+    return path
+
+
+def columnar_bytes(cohort_id: Optional[str] = None) -> bytes:
+    """A columnar export (format per COLUMNAR_SUFFIX) as bytes, for st.download_button"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = export_columnar(Path(directory) / f"assessments{COLUMNAR_SUFFIX}", cohort_id)
+        return path.read_bytes()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export assessment data")
+    subparsers = parser.add_subparsers(dest="export", required=True)
+
+    participants = subparsers.add_parser("participants", help="Participants with pre/post scores as CSV")
+    participants.add_argument("output", type=Path, help="CSV file to write ('-' for stdout)")
+    participants.add_argument("--cohort", help="Only this cohort id")
+    participants.add_argument("--status", choices=STATUS_FILTERS, default="All")
+
+    columnar = subparsers.add_parser("columnar", help="Assessment responses and metadata as Arrow, Parquet or .npz")
+    columnar.add_argument("output", type=Path, help="File to write (.arrow, .feather, .parquet or .npz)")
+    columnar.add_argument("--cohort", help="Only this cohort id")
+    args = parser.parse_args()
+
+    if args.export == "columnar":
+        written = export_columnar(args.output, args.cohort)
+        print(f"Wrote {written}")
+        return 0
+
+    out = sys.stdout.buffer if str(args.output) == "-" else open(args.output, "wb")
+    try:
+        for chunk in iter_participants_csv(args.cohort, args.status):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Append-only JSONL storage for NELFT Mentoring Assessment
+Each record is one JSON document per line, so a submission is a single append.
+Also provides the file locking, atomic replacement and group commit used by all writers.
+"""
+
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to locking within this process only
+    fcntl = None
+
+# The process umask, read once (it can only be read by setting it); new files get 0o666 less this
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+_process_locks: dict[str, threading.Lock] = {}
+_process_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Hold an exclusive lock on a data file (via a sidecar .lock file) across processes"""
+    lock_path = path.with_name(path.name + ".lock")
+    if fcntl is None:
+        with _process_locks_guard:
+            lock = _process_locks.setdefault(str(lock_path), threading.Lock())
+        with lock:
+            yield
+        return
+
+    with open(lock_path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def file_stat(path: Path) -> Optional[tuple]:
+    """(inode, size, mtime) of a file, or None if it is missing; changes whenever it is written or replaced"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def atomic_write(path: Path, data: bytes, durable: bool = True) -> None:
+    """Replace a file's contents atomically: write a temp file, fsync, then rename over it.
+
+    The file keeps its permissions, or gets those of a newly created file, rather
+    than the owner-only mode of the temp file. With durable=False nothing is
+    fsynced: readers still see the old or the new contents, but a crash may
+    lose the change (for derived files that can be rebuilt).
+    """
+    try:
+        mode = path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+    if durable and hasattr(os, "O_DIRECTORY"):
+        # Persist the rename itself
+        dir_fd = os.open(path.parent, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def atomic_write_json(path: Path, data: Any, durable: bool = True) -> None:
+    """Atomically replace a JSON document"""
+    atomic_write(path, json.dumps(data, indent=2).encode("utf-8"), durable)
+
+
+def _encode(record: dict) -> bytes:
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def append_record(path: Path, record: dict) -> int:
+    """Append one record to the log, flush it to disk and return its byte offset"""
+    return append_records(path, [record])[0]
+
+
+def append_records(path: Path, records: list[dict]) -> list[int]:
+    """Append records with a single write and fsync, returning each one's byte offset.
+
+    Callers that need a consistent view of the log across processes should hold
+    file_lock(path) around this.
+    """
+    lines = [_encode(record) for record in records]
+    torn = _has_torn_tail(path)
+    with open(path, "ab") as f:
+        if torn:
+            # Terminate a partial line left by a crash so these records stay readable
+            f.write(b"\n")
+        offset = f.tell()
+        offsets = []
+        for line in lines:
+            offsets.append(offset)
+            offset += len(line)
+        f.write(b"".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+    return offsets
+
+
+def _has_torn_tail(path: Path) -> bool:
+    """Check whether the log ends without a trailing newline"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+def read_records(path: Path) -> list[dict]:
+    """Replay the log into a list of records"""
+    records, _ = read_records_from(path, 0)
+    return records
+
+
+def read_records_from(path: Path, offset: int) -> tuple[list[dict], int]:
+    """Read the complete records after a byte offset, returning them with the offset reached"""
+    if not path.exists():
+        return [], 0
+
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Unterminated tail: a write in progress or torn by a crash
+                break
+            offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A torn line that a later append terminated is skipped
+                continue
+    return records, offset
+
+
+def read_record_at(path: Path, offset: int) -> Optional[dict]:
+    """Read the single record starting at a byte offset"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            line = f.readline()
+    except FileNotFoundError:
+        return None
+
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def iter_records_with_offsets(path: Path, offset: int = 0) -> Iterator[tuple[int, dict]]:
+    """Yield each complete record in the log (from a byte offset) with the byte offset it starts at"""
+    if not path.exists():
+        return
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            start, offset = offset, offset + len(line)
+            if not line.endswith(b"\n"):
+                break
+            if not line.strip():
+                continue
+            try:
+                yield start, json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def write_records(path: Path, records: list[dict]) -> None:
+    """Atomically replace the whole log with a list of records"""
+    atomic_write(path, b"".join(_encode(record) for record in records))
+
+
+class BackgroundWriter:
+    """Commit items on a background thread in batches, acknowledging each once it is durable.
+
+    submit() queues an item and returns a Future at once. A single writer
+    thread drains the queue: after the first item it waits `window` seconds
+    so submissions from concurrent sessions join the same batch, runs
+    `commit` once on the batch, and only then resolves each Future with its
+    result (or the commit's exception). Under burst load this turns many
+    lock/write/fsync cycles into one without any caller waiting on disk.
+    """
+
+    def __init__(self, commit: Callable[[list], list], window: float = 0.005, max_batch: int = 1000,
+                 name: str = "background-writer"):
+        self._commit = commit
+        self._window = window
+        self._max_batch = max_batch
+        self._name = name
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._idle = threading.Condition()
+        self._unfinished = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item; the Future resolves to its commit result once the batch is written"""
+        future = Future()
+        with self._idle:
+            self._unfinished += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+        self._queue.put((item, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued item has been committed; returns False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            if self._window:
+                time.sleep(self._window)
+            while len(batch) < self._max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Items whose Future was cancelled while queued are dropped
+            live = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            try:
+                if live:
+                    results = self._commit([item for item, _ in live])
+                    for (_, future), result in zip(live, results):
+                        future.set_result(result)
+            except BaseException as e:
+                for _, future in live:
+                    future.set_exception(e)
+            finally:
+                with self._idle:
+                    self._unfinished -= len(batch)
+                    self._idle.notify_all()
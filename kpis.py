@@ -0,0 +1,136 @@
+"""
+KPI engine for NELFT Mentoring Assessment
+Programme KPIs for every cohort at once, computed with NumPy over paired pre/post response arrays
+"""
+
+from typing import Callable, Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from records import NUM_QUESTIONS, Assessment
+
+# Questions a participant must improve on to count towards the KPI (a majority: 7 of 12)
+MAJORITY = NUM_QUESTIONS // 2 + 1
+
+_NO_RESPONSES = bytes(NUM_QUESTIONS)
+
+
+class PairedArrays(NamedTuple):
+    """One row per participant, with their pre and post assessment side by side"""
+    cohorts: np.ndarray        # (P,) int index into cohort_ids
+    has_pre: np.ndarray        # (P,) bool
+    has_post: np.ndarray       # (P,) bool
+    pre: np.ndarray            # (P, 12) uint8 scores, 0 where there is no pre-assessment
+    post: np.ndarray           # (P, 12) uint8 scores, 0 where there is no post-assessment
+    pre_average: np.ndarray    # (P,) float64 stored average score, 0 where missing
+    post_average: np.ndarray   # (P,) float64
+    cohort_ids: list[Optional[str]]
+
+
+def _side(assessments: list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Presence, scores and average score columns for one side (pre or post) of the pairs"""
+    count = len(assessments)
+    present = np.fromiter((a is not None for a in assessments), dtype=bool, count=count)
+    # Scores are 0-5, so each assessment packs into 12 bytes
+    scores = np.frombuffer(
+        b"".join([bytes(a.responses) if a is not None else _NO_RESPONSES for a in assessments]), dtype=np.uint8
+    ).reshape(-1, NUM_QUESTIONS)
+    averages = np.fromiter(((a.average_score or 0) if a is not None else 0 for a in assessments),
+                           dtype=np.float64, count=count)
+    return present, scores, averages
+
+
+def paired_arrays(participants: list[dict]) -> PairedArrays:
+    """Arrays for participants as returned by get_participant_data (pre_assessment / post_assessment)"""
+    codes: dict[Optional[str], int] = {}
+    cohorts = np.fromiter((codes.setdefault(p["cohort"], len(codes)) for p in participants),
+                          dtype=np.int64, count=len(participants))
+    has_pre, pre, pre_average = _side([p["pre_assessment"] for p in participants])
+    has_post, post, post_average = _side([p["post_assessment"] for p in participants])
+    return PairedArrays(cohorts, has_pre, has_post, pre, post, pre_average, post_average, list(codes))
+
+
+def extend_paired_arrays(arrays: PairedArrays, rows: dict[str, int], added: Iterable[Assessment],
+                         key_func: Callable[[Assessment], str]) -> tuple[PairedArrays, dict[str, int]]:
+    """The arrays with newly added assessments paired in, and the participant key -> row map to match.
+
+    Each assessment sets the pre or post side of its participant's row (a new
+    row at the end for a new participant), later ones winning, as in
+    participants_view.pair_records. Costs one copy of the arrays plus work for
+    the added assessments only; `arrays` and `rows` are left unchanged.
+    """
+    rows = dict(rows)
+    codes = {cohort_id: code for code, cohort_id in enumerate(arrays.cohort_ids)}
+    new_cohorts: list[int] = []
+    sides: tuple[dict[int, Assessment], dict[int, Assessment]] = ({}, {})
+    for a in added:
+        key = key_func(a)
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = len(rows)
+            new_cohorts.append(codes.setdefault(a.cohort, len(codes)))
+        sides[0 if a.is_pre else 1][row] = a
+
+    grow = len(new_cohorts)
+    arrays = PairedArrays(
+        np.concatenate([arrays.cohorts, np.array(new_cohorts, dtype=np.int64)]),
+        np.concatenate([arrays.has_pre, np.zeros(grow, dtype=bool)]),
+        np.concatenate([arrays.has_post, np.zeros(grow, dtype=bool)]),
+        np.concatenate([arrays.pre, np.zeros((grow, NUM_QUESTIONS), dtype=np.uint8)]),
+        np.concatenate([arrays.post, np.zeros((grow, NUM_QUESTIONS), dtype=np.uint8)]),
+        np.concatenate([arrays.pre_average, np.zeros(grow)]),
+        np.concatenate([arrays.post_average, np.zeros(grow)]),
+        list(codes)
+    )
+    for side, present, scores, averages in (
+        (sides[0], arrays.has_pre, arrays.pre, arrays.pre_average),
+        (sides[1], arrays.has_post, arrays.post, arrays.post_average)
+    ):
+        if side:
+            index = np.fromiter(side, dtype=np.int64, count=len(side))
+            present[index], scores[index], averages[index] = _side(list(side.values()))
+    return arrays, rows
+
+
+def summarise(total: int, complete: int, pre_only: int, total_improvement: float, improved_count: int) -> dict:
+    """The dashboard's KPI dict from participant counts and the summed score improvement"""
+    return {
+        "total_participants": total,
+        "complete": complete,
+        "pre_only": pre_only,
+        "completion_rate": (complete / total * 100) if total > 0 else 0,
+        "avg_improvement": total_improvement / complete if complete > 0 else 0,
+        "kpi_achievement": (improved_count / complete * 100) if complete > 0 else 0,
+        "improved_count": improved_count
+    }
+
+
+def cohort_kpis(arrays: PairedArrays) -> dict[Optional[str], dict]:
+    """KPIs for every cohort (keyed by cohort id) and for all participants (key None), in one pass.
+
+    A participant is complete with both assessments and pre-only with just
+    the pre; improvement is the change in average score over complete
+    participants, and the KPI counts those whose post score beats their pre
+    score on at least MAJORITY questions.
+    """
+    complete = arrays.has_pre & arrays.has_post
+    pre_only = arrays.has_pre & ~arrays.has_post
+    improved = complete & ((arrays.post > arrays.pre).sum(axis=1) >= MAJORITY)
+    change = np.where(complete, arrays.post_average - arrays.pre_average, 0.0)
+
+    n = len(arrays.cohort_ids)
+    columns = (
+        np.bincount(arrays.cohorts, minlength=n),
+        np.bincount(arrays.cohorts, weights=complete, minlength=n),
+        np.bincount(arrays.cohorts, weights=pre_only, minlength=n),
+        np.bincount(arrays.cohorts, weights=change, minlength=n),
+        np.bincount(arrays.cohorts, weights=improved, minlength=n)
+    )
+    results = {
+        cohort_id: summarise(int(total), int(done), int(pre), float(improvement), int(better))
+        for cohort_id, total, done, pre, improvement, better in zip(arrays.cohort_ids, *columns)
+    }
+    results[None] = summarise(
+        len(arrays.cohorts), int(complete.sum()), int(pre_only.sum()), float(change.sum()), int(improved.sum())
+    )
+    return results
@@ -15,9 +15,12 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from data_manager import (
-    QUESTIONS, load_cohorts, save_cohorts, add_cohort,
-    load_assessments, get_participant_data
+    QUESTIONS, get_cohort_registry, save_cohorts, add_cohort, read_snapshot, get_changes,
+    is_cohort_archived, archive_inactive_cohorts, restore_cohort
 )
+from exports import COLUMNAR_SUFFIX, columnar_bytes, participants_csv_bytes
+from kpis import summarise
+from response_matrix import QuestionTotals, question_averages
 
 # Page configuration
 st.set_page_config(
@@ -53,57 +56,29 @@ def check_password():
     return True
 
 
-def calculate_kpis(participants, selected_cohort=None):
-    """Calculate key performance indicators"""
-    if selected_cohort:
-        participants = [p for p in participants if p["cohort"] == selected_cohort]
-    
-    total = len(participants)
-    complete = len([p for p in participants if p["pre_assessment"] and p["post_assessment"]])
-    pre_only = len([p for p in participants if p["pre_assessment"] and not p["post_assessment"]])
-    
-    completion_rate = (complete / total * 100) if total > 0 else 0
-    
-    # Calculate improvement
-    total_improvement = 0
-    improved_count = 0
-    
-    for p in participants:
-        if p["pre_assessment"] and p["post_assessment"]:
-            pre_avg = p["pre_assessment"].get("average_score", 0)
-            post_avg = p["post_assessment"].get("average_score", 0)
-            total_improvement += post_avg - pre_avg
-            
-            # Check if majority of questions improved
-            questions_improved = 0
-            for q in QUESTIONS:
-                pre_score = p["pre_assessment"].get("responses", {}).get(q["id"], 0)
-                post_score = p["post_assessment"].get("responses", {}).get(q["id"], 0)
-                if post_score > pre_score:
-                    questions_improved += 1
-            
-            if questions_improved >= 7:
-                improved_count += 1
-    
-    avg_improvement = total_improvement / complete if complete > 0 else 0
-    kpi_achievement = (improved_count / complete * 100) if complete > 0 else 0
-    
-    return {
-        "total_participants": total,
-        "complete": complete,
-        "pre_only": pre_only,
-        "completion_rate": completion_rate,
-        "avg_improvement": avg_improvement,
-        "kpi_achievement": kpi_achievement,
-        "improved_count": improved_count
-    }
+def calculate_kpis(snapshot, selected_cohort=None):
+    """Calculate key performance indicators (for every cohort at once, cached with the snapshot)"""
+    return snapshot.get_kpis().get(selected_cohort) or summarise(0, 0, 0, 0.0, 0)
+
 
+@st.cache_resource
+def question_totals():
+    """Running question totals shared by every dashboard session, advanced with the change feed"""
+    return QuestionTotals()
 
-def show_overview(participants, cohorts, selected_cohort):
+
+def get_question_averages(snapshot, selected_cohort=None):
+    """Pre and post mean score per question, updated incrementally as submissions arrive"""
+    if selected_cohort in snapshot.archived:
+        return question_averages(snapshot.get_response_matrix(selected_cohort), selected_cohort)
+    return question_totals().question_averages(snapshot, get_changes, selected_cohort)
+
+
+def show_overview(registry, selected_cohort, snapshot):
     """Display overview dashboard"""
     st.header("📊 Overview")
     
-    kpis = calculate_kpis(participants, selected_cohort)
+    kpis = calculate_kpis(snapshot, selected_cohort)
     
     # KPI Cards
     col1, col2, col3, col4 = st.columns(4)
@@ -146,23 +121,14 @@ def show_overview(participants, cohorts, selected_cohort):
     with col1:
         st.subheader("Score Distribution by Question")
         
-        # Filter assessments by cohort
-        assessments = load_assessments()
-        if selected_cohort:
-            assessments = [a for a in assessments if a["cohort"] == selected_cohort]
-        
-        # Calculate averages per question
-        chart_data = []
-        for q in QUESTIONS:
-            pre_scores = [a["responses"].get(q["id"], 0) for a in assessments if a["assessment_type"] == "pre"]
-            post_scores = [a["responses"].get(q["id"], 0) for a in assessments if a["assessment_type"] == "post"]
-            
-            pre_avg = sum(pre_scores) / len(pre_scores) if pre_scores else 0
-            post_avg = sum(post_scores) / len(post_scores) if post_scores else 0
-            
-            chart_data.append({"Question": f"Q{q['id']}", "Pre-Programme": pre_avg, "Post-Programme": post_avg})
+        # Calculate averages per question (running totals, advanced by each new submission)
+        pre_avgs, post_avgs = get_question_averages(snapshot, selected_cohort)
         
-        df_chart = pd.DataFrame(chart_data)
+        df_chart = pd.DataFrame({
+            "Question": [f"Q{q['id']}" for q in QUESTIONS],
+            "Pre-Programme": pre_avgs,
+            "Post-Programme": post_avgs
+        })
         
         fig = go.Figure()
         fig.add_trace(go.Bar(
@@ -218,25 +184,18 @@ def show_overview(participants, cohorts, selected_cohort):
     st.markdown("---")
     st.subheader("Recent Submissions")
     
-    assessments = load_assessments()
-    if selected_cohort:
-        assessments = [a for a in assessments if a["cohort"] == selected_cohort]
-    
-    # Sort by date and take most recent
-    assessments_sorted = sorted(assessments, key=lambda x: x.get("submitted_at", ""), reverse=True)[:10]
+    # Most recent first
+    assessments_sorted = snapshot.get_recent_assessments(selected_cohort, limit=10)
     
     if assessments_sorted:
         recent_data = []
         for a in assessments_sorted:
-            cohort = next((c["name"] for c in cohorts if c["id"] == a["cohort"]), a["cohort"])
-            cohort_short = cohort.split(" - ")[1] if " - " in cohort else cohort
-            
             recent_data.append({
-                "Name": a.get("name", ""),
-                "Cohort": cohort_short,
-                "Type": a.get("assessment_type", "").upper(),
-                "Avg Score": f"{a.get('average_score', 0):.2f}",
-                "Submitted": datetime.fromisoformat(a.get("submitted_at", "")).strftime("%d %b %Y") if a.get("submitted_at") else ""
+                "Name": a.name,
+                "Cohort": registry.short_name(a.cohort),
+                "Type": (a.assessment_type or "").upper(),
+                "Avg Score": f"{a.average_score or 0:.2f}",
+                "Submitted": datetime.fromisoformat(a.submitted_at).strftime("%d %b %Y") if a.submitted_at else ""
             })
         
         st.dataframe(pd.DataFrame(recent_data), use_container_width=True, hide_index=True)
@@ -262,28 +221,49 @@ def show_cohorts(cohorts, participants):
                 else:
                     st.error("Please enter a cohort name")
     
+    # Move finished cohorts out of the working set
+    if any(not c.active and not is_cohort_archived(c.id) for c in cohorts):
+        if st.button("🗄️ Archive Inactive Cohorts"):
+            archived = archive_inactive_cohorts()
+            st.success(f"Archived {len(archived)} cohort(s)")
+            st.rerun()
+    
     # Display cohorts
     st.markdown("---")
     
     cols = st.columns(3)
     
+    # Group participants once rather than scanning them for every cohort
+    by_cohort = {}
+    for p in participants:
+        by_cohort.setdefault(p["cohort"], []).append(p)
+    
     for i, cohort in enumerate(cohorts):
-        cohort_participants = [p for p in participants if p["cohort"] == cohort["id"]]
+        archived = is_cohort_archived(cohort.id)
+        cohort_participants = by_cohort.get(cohort.id, [])
         complete = len([p for p in cohort_participants if p["pre_assessment"] and p["post_assessment"]])
         pre_only = len([p for p in cohort_participants if p["pre_assessment"] and not p["post_assessment"]])
         
         with cols[i % 3]:
             with st.container(border=True):
-                st.markdown(f"**{cohort['name']}**")
-                st.caption(f"{'Active' if cohort.get('active', True) else 'Inactive'}")
+                st.markdown(f"**{cohort.name}**")
+                st.caption(f"{'Active' if cohort.active else 'Inactive'}{' · Archived' if archived else ''}")
                 
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Total", len(cohort_participants))
-                col2.metric("Complete", complete)
-                col3.metric("Pending", pre_only)
+                if archived and not cohort_participants:
+                    # Archived data is only loaded when the cohort is selected in the sidebar
+                    st.caption("Select this cohort in the sidebar to view its results.")
+                else:
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("Total", len(cohort_participants))
+                    col2.metric("Complete", complete)
+                    col3.metric("Pending", pre_only)
+                
+                if archived and st.button("Restore", key=f"restore_{cohort.id}"):
+                    restore_cohort(cohort.id)
+                    st.rerun()
 
 
-def show_participants(participants, cohorts, selected_cohort):
+def show_participants(participants, registry, selected_cohort):
     """Display participant list"""
     st.header("👤 Participants")
     
@@ -309,11 +289,8 @@ def show_participants(participants, cohorts, selected_cohort):
     # Build table data
     table_data = []
     for p in filtered:
-        cohort = next((c["name"] for c in cohorts if c["id"] == p["cohort"]), p["cohort"])
-        cohort_short = cohort.split(" - ")[1] if " - " in cohort else cohort
-        
-        pre_score = p["pre_assessment"].get("average_score", 0) if p["pre_assessment"] else None
-        post_score = p["post_assessment"].get("average_score", 0) if p["post_assessment"] else None
+        pre_score = p["pre_assessment"].average_score or 0 if p["pre_assessment"] else None
+        post_score = p["post_assessment"].average_score or 0 if p["post_assessment"] else None
         
         change = None
         if pre_score is not None and post_score is not None:
@@ -322,7 +299,7 @@ def show_participants(participants, cohorts, selected_cohort):
         table_data.append({
             "Name": p.get("name", ""),
             "Email": p.get("email", ""),
-            "Cohort": cohort_short,
+            "Cohort": registry.short_name(p["cohort"]),
             "Pre Score": f"{pre_score:.2f}" if pre_score else "—",
             "Post Score": f"{post_score:.2f}" if post_score else "—",
             "Change": f"{change:+.2f}" if change is not None else "—"
@@ -332,24 +309,32 @@ def show_participants(participants, cohorts, selected_cohort):
         df = pd.DataFrame(table_data)
         st.dataframe(df, use_container_width=True, hide_index=True)
         
-        # Export button
-        csv = df.to_csv(index=False)
+        # Export button (the CSV, with every question score, is only generated when clicked)
         st.download_button(
             "📥 Export to CSV",
-            csv,
+            lambda: participants_csv_bytes(selected_cohort, status_filter),
             "participants_export.csv",
             "text/csv",
             use_container_width=False
         )
+        
+        # Typed columnar copy of every assessment for BI tools (Arrow IPC, or .npz without pyarrow)
+        st.download_button(
+            "📦 Export for BI Tools",
+            lambda: columnar_bytes(selected_cohort),
+            f"assessments_export{COLUMNAR_SUFFIX}",
+            "application/octet-stream",
+            use_container_width=False
+        )
     else:
         st.info("No participants match the current filters.")
 
 
-def show_reports(participants, cohorts, selected_cohort):
+def show_reports(cohorts, selected_cohort, snapshot):
     """Display reports section"""
     st.header("📈 Reports")
     
-    kpis = calculate_kpis(participants, selected_cohort)
+    kpis = calculate_kpis(snapshot, selected_cohort)
     
     col1, col2 = st.columns(2)
     
@@ -379,18 +364,10 @@ def show_reports(participants, cohorts, selected_cohort):
             st.subheader("📊 Question Analysis")
             st.write("Detailed breakdown of responses by capability statement.")
             
-            assessments = load_assessments()
-            if selected_cohort:
-                assessments = [a for a in assessments if a["cohort"] == selected_cohort]
+            pre_avgs, post_avgs = get_question_averages(snapshot, selected_cohort)
             
             analysis_data = []
-            for q in QUESTIONS:
-                pre_scores = [a["responses"].get(q["id"], 0) for a in assessments if a["assessment_type"] == "pre"]
-                post_scores = [a["responses"].get(q["id"], 0) for a in assessments if a["assessment_type"] == "post"]
-                
-                pre_avg = sum(pre_scores) / len(pre_scores) if pre_scores else 0
-                post_avg = sum(post_scores) / len(post_scores) if post_scores else 0
-                
+            for q, pre_avg, post_avg in zip(QUESTIONS, pre_avgs, post_avgs):
                 analysis_data.append({
                     "Q": q["id"],
                     "Category": q["category"],
@@ -409,15 +386,12 @@ def main():
     
     st.title("📊 Assessment Dashboard")
     
-    # Load data
-    cohorts = load_cohorts()
-    participants = get_participant_data()
-    
     # Sidebar
     st.sidebar.header("Filters")
     
+    registry = get_cohort_registry()
     cohort_options = {"All Cohorts": None}
-    cohort_options.update({c["name"]: c["id"] for c in cohorts})
+    cohort_options.update(registry.id_by_name)
     
     selected_cohort_name = st.sidebar.selectbox(
         "Cohort",
@@ -425,6 +399,11 @@ def main():
     )
     selected_cohort = cohort_options[selected_cohort_name]
     
+    # Load data (an archived cohort is read from its cold file only when selected). Every panel reads
+    # the same snapshot, so one rerun shows one consistent version while submissions continue.
+    snapshot = read_snapshot(include_archived=[selected_cohort] if selected_cohort else [])
+    participants = snapshot.get_participant_data()
+    
     st.sidebar.markdown("---")
     
     # Navigation
@@ -447,13 +426,13 @@ def main():
     
     # Route to page
     if page == "Overview":
-        show_overview(participants, cohorts, selected_cohort)
+        show_overview(registry, selected_cohort, snapshot)
     elif page == "Cohorts":
-        show_cohorts(cohorts, participants)
+        show_cohorts(registry.cohorts, participants)
     elif page == "Participants":
-        show_participants(participants, cohorts, selected_cohort)
+        show_participants(participants, registry, selected_cohort)
     elif page == "Reports":
-        show_reports(participants, cohorts, selected_cohort)
+        show_reports(registry.cohorts, selected_cohort, snapshot)
 
 
 if __name__ == "__main__":
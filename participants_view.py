@@ -0,0 +1,112 @@
+"""
+Materialised participant pairing view for NELFT Mentoring Assessment
+Keeps each participant's pre/post assessment ids up to date as submissions are appended
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import jsonl_store
+
+
+def pair_records(participants: dict, records: Iterable[dict], key_func: Callable[[dict], str]) -> dict:
+    """Set the pre or post slot of each record's participant row, creating rows as needed"""
+    for a in records:
+        key = key_func(a)
+        row = participants.get(key)
+        if row is None:
+            row = participants[key] = {
+                "name": a.get("name"),
+                "email": a.get("email"),
+                "cohort": a.get("cohort"),
+                "pre_id": None,
+                "post_id": None
+            }
+        row["pre_id" if a.get("assessment_type") == "pre" else "post_id"] = a.get("id")
+    return participants
+
+
+class ParticipantsView:
+    """Pre/post pairing keyed by participant, kept in memory and checkpointed next to the assessment log.
+
+    The pairing is caught up by applying only the log tail past the byte offset
+    it has seen, so a submission sets a single pre or post slot instead of
+    re-pairing the whole history, and nothing is written per submission. The
+    compactor saves a checkpoint (the pairing plus the log inode and offset it
+    is current up to) so a cold start pairs only the records appended since.
+    If the log has been rewritten the view is rebuilt from scratch.
+    """
+
+    def __init__(self, path: Path, log_path: Path, key_func: Callable[[dict], str]):
+        self.path = path
+        self.log_path = log_path
+        self.key_func = key_func
+        self._lock = threading.Lock()
+        self._state: Optional[dict] = None
+        # Log inode and offset the checkpoint file is current up to
+        self._saved: tuple[Optional[int], int] = (None, 0)
+
+    def _load(self) -> dict:
+        """Get the in-memory view, starting from the checkpoint file on first use"""
+        if self._state is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._state = json.load(f)
+            except FileNotFoundError:
+                self._state = {"log_inode": None, "log_offset": 0, "participants": {}}
+            self._saved = (self._state["log_inode"], self._state["log_offset"])
+        return self._state
+
+    def _catch_up(self, state: dict) -> None:
+        """Apply log records the view has not seen yet"""
+        try:
+            log_stat = self.log_path.stat()
+        except FileNotFoundError:
+            log_stat = None
+
+        if log_stat is None:
+            state.update(log_inode=None, log_offset=0, participants={})
+            return
+
+        if state["log_inode"] != log_stat.st_ino or state["log_offset"] > log_stat.st_size:
+            # The log was rewritten: rebuild the view from the start
+            state.update(log_inode=log_stat.st_ino, log_offset=0, participants={})
+        elif state["log_offset"] == log_stat.st_size:
+            return
+
+        records, state["log_offset"] = jsonl_store.read_records_from(self.log_path, state["log_offset"])
+        pair_records(state["participants"], records, self.key_func)
+
+    def rows(self) -> list[dict]:
+        """Current participant rows: name, email, cohort, pre_id and post_id"""
+        with self._lock:
+            state = self._load()
+            self._catch_up(state)
+            return [dict(row) for row in state["participants"].values()]
+
+    def update(self) -> None:
+        """Apply newly appended records to a view already in memory (call with the log lock held)"""
+        with self._lock:
+            if self._state is not None:
+                self._catch_up(self._state)
+
+    def checkpoint(self, min_tail_bytes: int = 0) -> bool:
+        """Save the view once it is at least `min_tail_bytes` of log ahead of the file; True if saved"""
+        with self._lock:
+            state = self._load()
+            self._catch_up(state)
+            inode, offset = self._saved
+            behind = state["log_offset"] - (offset if inode == state["log_inode"] else 0)
+            if behind < max(min_tail_bytes, 1):
+                return False
+            jsonl_store.atomic_write(self.path, json.dumps(state, separators=(",", ":")).encode("utf-8"))
+            self._saved = (state["log_inode"], state["log_offset"])
+            return True
+
+    def invalidate(self) -> None:
+        """Drop the view and its checkpoint so it is rebuilt from the log on next use"""
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+            self._state, self._saved = None, (None, 0)
@@ -0,0 +1,117 @@
+"""
+Persistent pre-assessment index for NELFT Mentoring Assessment
+Maps a participant key (normalised email + cohort) to the log offset of their pre-assessment
+"""
+
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+import jsonl_store
+
+
+class PreAssessmentIndex:
+    """Hash index from participant key to pre-assessment, persisted as an append-only file.
+
+    Each entry records the assessment id and the byte offset of its line in the
+    assessment log, so a lookup is one dict access plus one seek, and a miss
+    is one dict access. Entries are checked against the log on read and the
+    index is rebuilt if they disagree (e.g. after the log has been rewritten).
+    Entries lost in a crash between a log append and its index append are
+    recovered the first time a process uses the index, by scanning only the
+    log past the last indexed pre-assessment.
+    """
+
+    def __init__(self, index_path: Path, log_path: Path, key_func: Callable[[dict], str]):
+        self.index_path = index_path
+        self.log_path = log_path
+        self.key_func = key_func
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[str, int]] = {}
+        self._inode = None
+        self._offset = 0
+        self._reconciled = False
+
+    def _refresh(self) -> None:
+        """Catch up with entries appended to the index file by other processes"""
+        if not self.index_path.exists():
+            self._rebuild()
+
+        inode = self.index_path.stat().st_ino
+        if inode != self._inode:
+            self._entries, self._inode, self._offset = {}, inode, 0
+
+        entries, self._offset = jsonl_store.read_records_from(self.index_path, self._offset)
+        for entry in entries:
+            # The first pre-assessment for a participant wins, as in a linear scan
+            self._entries.setdefault(entry["key"], (entry["id"], entry["offset"]))
+
+    def _rebuild(self) -> None:
+        """Rebuild the index file from a full scan of the assessment log"""
+        entries = {}
+        for offset, record in jsonl_store.iter_records_with_offsets(self.log_path):
+            if record.get("assessment_type") == "pre":
+                key = self.key_func(record)
+                entries.setdefault(key, {"key": key, "id": record["id"], "offset": offset})
+
+        jsonl_store.write_records(self.index_path, list(entries.values()))
+        self._reconciled = True
+
+    def _reconcile(self) -> None:
+        """Index pre-assessments appended to the log after the last indexed one but missing from the index"""
+        self._refresh()
+        start = max((offset for _, offset in self._entries.values()), default=0)
+        missing = {}
+        for offset, record in jsonl_store.iter_records_with_offsets(self.log_path, start):
+            if record.get("assessment_type") == "pre":
+                key = self.key_func(record)
+                if key not in self._entries and key not in missing:
+                    missing[key] = {"key": key, "id": record["id"], "offset": offset}
+        if missing:
+            jsonl_store.append_records(self.index_path, list(missing.values()))
+            self._refresh()
+        self._reconciled = True
+
+    def add(self, entries: list[tuple[str, str, int]]) -> None:
+        """Record newly appended pre-assessments as (key, assessment id, log offset)"""
+        if not entries:
+            return
+        with self._lock:
+            if not self.index_path.exists():
+                self._rebuild()
+            elif not self._reconciled:
+                self._reconcile()
+            jsonl_store.append_records(self.index_path, [
+                {"key": key, "id": assessment_id, "offset": offset}
+                for key, assessment_id, offset in entries
+            ])
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Find the pre-assessment for a participant key, or None if not indexed"""
+        with self._lock:
+            if key not in self._entries:
+                self._refresh()
+                if not self._reconciled:
+                    self._reconcile()
+            if key not in self._entries:
+                return None
+
+            assessment_id, offset = self._entries[key]
+            record = jsonl_store.read_record_at(self.log_path, offset)
+            if record is None or record.get("id") != assessment_id:
+                # Stale offsets: the log was rewritten since the index was built
+                self._rebuild()
+                self._inode = None
+                self._refresh()
+                if key not in self._entries:
+                    return None
+                assessment_id, offset = self._entries[key]
+                record = jsonl_store.read_record_at(self.log_path, offset)
+            return record
+
+    def invalidate(self) -> None:
+        """Drop the index so it is rebuilt from the log on next use"""
+        with self._lock:
+            self.index_path.unlink(missing_ok=True)
+            self._entries, self._inode, self._offset = {}, None, 0
+            self._reconciled = False
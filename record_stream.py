@@ -0,0 +1,99 @@
+"""
+Streaming record readers for NELFT Mentoring Assessment
+Yields records one at a time from a JSON array or JSONL file, so large archives are read in bounded memory
+"""
+
+import json
+from pathlib import Path
+from typing import Iterator
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def _skip(buffer: str, pos: int, chars: str) -> int:
+    while pos < len(buffer) and buffer[pos] in chars:
+        pos += 1
+    return pos
+
+
+def iter_json_array(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Yield each element of a top-level JSON array without loading the whole document.
+
+    The file is read in chunks and each element is decoded as soon as it is
+    complete; only the unconsumed part of the current chunk is kept in memory.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer, pos = buffer[pos:] + chunk, 0
+            return True
+
+        while True:
+            pos = _skip(buffer, pos, _WHITESPACE)
+            if pos < len(buffer) or not fill():
+                break
+        if eof and pos >= len(buffer):
+            return
+        if buffer[pos] != "[":
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos += 1
+
+        while True:
+            pos = _skip(buffer, pos, _WHITESPACE + ",")
+            if pos >= len(buffer):
+                if not fill():
+                    raise ValueError(f"{path} ends inside the JSON array")
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                record, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element continues in the next chunk
+                if not fill():
+                    raise
+                continue
+            if end >= len(buffer) and not eof:
+                # A scalar may have been cut off mid-token; decode again with more input
+                if fill():
+                    continue
+            pos = end
+            yield record
+
+
+def iter_jsonl(path: Path) -> Iterator[dict]:
+    """Yield each complete record of a JSONL file, skipping torn or undecodable lines"""
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def iter_records(path: Path) -> Iterator[dict]:
+    """Yield records from a JSON array or JSONL file, detected from its first character"""
+    if not path.exists():
+        return
+
+    with open(path, "rb") as f:
+        head = f.read(CHUNK_SIZE).lstrip()
+    if head.startswith(b"["):
+        yield from iter_json_array(path)
+    else:
+        yield from iter_jsonl(path)
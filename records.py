@@ -0,0 +1,227 @@
+"""
+Record types for NELFT Mentoring Assessment
+Compact in-memory forms of assessments and cohorts, converted to and from dicts at the storage boundary
+"""
+
+import sys
+from typing import Optional
+
+NUM_QUESTIONS = 12
+
+# Version of the stored assessment layout. Records stamped with it hold responses
+# in canonical form: exactly the 12 questions keyed "1".."12" in order, with int
+# scores (0 = not answered). Unversioned records may use int or str keys, in any
+# order, with gaps.
+SCHEMA_VERSION = 1
+
+# Keys held in Assessment slots; anything else in a stored record is kept in `extra`
+_ASSESSMENT_KEYS = {
+    "id", "name", "email", "cohort", "assessment_type",
+    "responses", "reflections", "average_score", "submitted_at", "schema_version", "submission_key"
+}
+_COHORT_KEYS = {"id", "name", "active", "start_date"}
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Share one copy of a frequently repeated string (cohort ids, types)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def id_number(record_id: Optional[str]) -> int:
+    """Numeric part of an id such as "assessment-12" (0 if it has none)"""
+    suffix = (record_id or "").rsplit("-", 1)[-1]
+    return int(suffix) if suffix.isdigit() else 0
+
+
+def _response_tuple(responses: dict) -> tuple:
+    return tuple(
+        int(responses.get(q, responses.get(str(q), 0)) or 0)
+        for q in range(1, NUM_QUESTIONS + 1)
+    )
+
+
+def decode_responses(record: dict) -> tuple:
+    """A stored record's scores as a 12-tuple, question 1 first"""
+    responses = record.get("responses") or {}
+    if record.get("schema_version") == SCHEMA_VERSION and len(responses) == NUM_QUESTIONS:
+        # Fast path: canonical records are already in question order
+        return tuple(responses.values())
+    return _response_tuple(responses)
+
+
+def normalize_record(record: dict) -> dict:
+    """Bring a record to the current schema in place before it is stored"""
+    scores = _response_tuple(record.get("responses") or {})
+    record["responses"] = {str(q): score for q, score in enumerate(scores, start=1)}
+    record["schema_version"] = SCHEMA_VERSION
+    return record
+
+
+class Assessment:
+    """One assessment submission.
+
+    Responses are a tuple of 12 small ints, question 1 first (0 = not answered),
+    so per-question access is positional rather than a string-keyed dict lookup.
+    The form's idempotency key has its own slot, so records need no `extra`
+    dict just to carry it.
+    """
+
+    __slots__ = (
+        "id", "name", "email", "cohort", "assessment_type", "responses",
+        "reflection1", "reflection2", "average_score", "submitted_at", "extra", "submission_key"
+    )
+
+    def __init__(self, id: Optional[str], name: str, email: str, cohort: str, assessment_type: str,
+                 responses: tuple, reflection1: str = "", reflection2: str = "",
+                 average_score: Optional[float] = None, submitted_at: Optional[str] = None,
+                 extra: Optional[dict] = None, submission_key: Optional[str] = None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.cohort = _intern(cohort)
+        self.assessment_type = _intern(assessment_type)
+        self.responses = responses
+        self.reflection1 = reflection1
+        self.reflection2 = reflection2
+        self.average_score = average_score
+        self.submitted_at = submitted_at
+        self.extra = extra
+        self.submission_key = submission_key
+
+    @property
+    def is_pre(self) -> bool:
+        return self.assessment_type == "pre"
+
+    def score(self, question_id: int) -> int:
+        """Score for a question id (1-12)"""
+        return self.responses[question_id - 1]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Assessment":
+        """Build from a stored record of any schema version (responses keyed by int or str question id)"""
+        reflections = data.get("reflections") or {}
+        extra = {k: v for k, v in data.items() if k not in _ASSESSMENT_KEYS}
+        return cls(
+            id=data.get("id"),
+            name=data.get("name", ""),
+            email=data.get("email", ""),
+            cohort=data.get("cohort"),
+            assessment_type=data.get("assessment_type"),
+            responses=decode_responses(data),
+            reflection1=reflections.get("reflection1", ""),
+            reflection2=reflections.get("reflection2", ""),
+            average_score=data.get("average_score"),
+            submitted_at=data.get("submitted_at"),
+            extra=extra or None,
+            submission_key=data.get("submission_key")
+        )
+
+    def to_dict(self) -> dict:
+        """Convert to the stored record format"""
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "email": self.email,
+            "cohort": self.cohort,
+            "assessment_type": self.assessment_type,
+            "responses": {str(q): score for q, score in enumerate(self.responses, start=1)},
+            "reflections": {"reflection1": self.reflection1, "reflection2": self.reflection2},
+            "average_score": self.average_score,
+            "submitted_at": self.submitted_at,
+            "schema_version": SCHEMA_VERSION
+        }
+        if self.submission_key is not None:
+            data["submission_key"] = self.submission_key
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_row(self) -> list:
+        """Convert to a compact positional list (slot order), as used by snapshots"""
+        return [getattr(self, slot) for slot in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row: list) -> "Assessment":
+        """Build from a list produced by to_row"""
+        # __init__ takes its arguments in slot order
+        id, name, email, cohort, assessment_type, responses, *rest = row
+        assessment = cls(id, name, email, cohort, assessment_type, tuple(responses), *rest)
+        if assessment.extra and "submission_key" in assessment.extra:
+            # Rows written before the key had a slot carry it in extra
+            extra = dict(assessment.extra)
+            assessment.submission_key = extra.pop("submission_key")
+            assessment.extra = extra or None
+        return assessment
+
+    def __repr__(self) -> str:
+        return f"Assessment(id={self.id!r}, email={self.email!r}, cohort={self.cohort!r}, type={self.assessment_type!r})"
+
+
+class Cohort:
+    """One programme cohort"""
+
+    __slots__ = ("id", "name", "active", "start_date", "extra")
+
+    def __init__(self, id: str, name: str, active: bool = True, start_date: Optional[str] = None,
+                 extra: Optional[dict] = None):
+        self.id = _intern(id)
+        self.name = name
+        self.active = active
+        self.start_date = start_date
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Cohort":
+        """Build from a stored record"""
+        extra = {k: v for k, v in data.items() if k not in _COHORT_KEYS}
+        return cls(
+            id=data.get("id"),
+            name=data.get("name", ""),
+            active=data.get("active", True),
+            start_date=data.get("start_date"),
+            extra=extra or None
+        )
+
+    def to_dict(self) -> dict:
+        """Convert to the stored record format"""
+        data = {"id": self.id, "name": self.name, "active": self.active, "start_date": self.start_date}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __repr__(self) -> str:
+        return f"Cohort(id={self.id!r}, name={self.name!r}, active={self.active!r})"
+
+
+def short_cohort_name(name: str) -> str:
+    """Display form of a cohort name: the part after "Programme - ", e.g. "Cohort 1 (March 2025)" """
+    return name.split(" - ")[1] if " - " in name else name
+
+
+class CohortRegistry:
+    """Read-only lookups over one version of the cohort list, built once and shared.
+
+    The Cohort objects are shared by every caller, so they must not be
+    modified; edit the list from load_cohorts and save it instead.
+    """
+
+    def __init__(self, cohorts: list[Cohort]):
+        self.cohorts = cohorts
+        self.by_id = {c.id: c for c in cohorts}
+        # Later cohorts win on duplicate names, as in a name -> id dict built in list order
+        self.id_by_name = {c.name: c.id for c in cohorts}
+        self.active = [c for c in cohorts if c.active]
+        self.short_names = {c.id: short_cohort_name(c.name) for c in cohorts}
+
+    def get(self, cohort_id: Optional[str]) -> Optional[Cohort]:
+        """The cohort with this id, or None"""
+        return self.by_id.get(cohort_id)
+
+    def name(self, cohort_id: Optional[str]) -> str:
+        """The cohort's full name (its id if it is not in the list)"""
+        cohort = self.by_id.get(cohort_id)
+        return cohort.name if cohort else cohort_id
+
+    def short_name(self, cohort_id: Optional[str]) -> str:
+        """The cohort's short display name (its id if it is not in the list)"""
+        return self.short_names.get(cohort_id, cohort_id)
@@ -0,0 +1,266 @@
+"""
+Columnar response store for NELFT Mentoring Assessment
+Keeps every assessment's 12 question scores as an N x 12 uint8 NumPy matrix for vectorised analysis
+"""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+import jsonl_store
+from records import NUM_QUESTIONS, decode_responses, id_number
+
+# Assessment type codes in the `types` column
+TYPE_PRE = 0
+TYPE_POST = 1
+
+# Column name -> (file name, dtype, values per row)
+COLUMNS = {
+    "responses": ("responses.u1", np.uint8, NUM_QUESTIONS),
+    "cohorts": ("cohorts.u2", np.uint16, 1),
+    "types": ("types.u1", np.uint8, 1),
+    "timestamps": ("timestamps.i8", np.int64, 1),
+    "ids": ("ids.u4", np.uint32, 1)
+}
+
+
+class ResponseArrays(NamedTuple):
+    """Read-only column arrays, one row per assessment in storage order"""
+    responses: np.ndarray   # (N, 12) uint8, 0 where a question was not answered
+    cohorts: np.ndarray     # (N,) uint16 index into cohort_ids
+    types: np.ndarray       # (N,) uint8, TYPE_PRE or TYPE_POST
+    timestamps: np.ndarray  # (N,) int64 submission time, seconds since the epoch
+    ids: np.ndarray         # (N,) uint32 numeric part of the assessment id
+    cohort_ids: list[str]
+
+    def cohort_mask(self, cohort_id: Optional[str]) -> np.ndarray:
+        """Boolean row mask for one cohort (all rows when cohort_id is None)"""
+        if cohort_id is None:
+            return np.ones(len(self.types), dtype=bool)
+        if cohort_id not in self.cohort_ids:
+            return np.zeros(len(self.types), dtype=bool)
+        return self.cohorts == self.cohort_ids.index(cohort_id)
+
+    def select(self, mask: np.ndarray) -> "ResponseArrays":
+        """In-memory copy of the rows where mask is True"""
+        return self._replace(
+            responses=self.responses[mask], cohorts=self.cohorts[mask], types=self.types[mask],
+            timestamps=self.timestamps[mask], ids=self.ids[mask]
+        )
+
+
+def _timestamp(submitted_at: Optional[str]) -> int:
+    try:
+        return int(datetime.fromisoformat(submitted_at).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def _columns(records: list[dict], codes: dict) -> dict[str, np.ndarray]:
+    """Column arrays for records, with cohorts encoded through `codes`"""
+    return {
+        "responses": np.array([decode_responses(a) for a in records],
+                              dtype=np.uint8).reshape(-1, NUM_QUESTIONS),
+        "cohorts": np.array([codes[a.get("cohort")] for a in records], dtype=np.uint16),
+        "types": np.array([TYPE_PRE if a.get("assessment_type") == "pre" else TYPE_POST
+                           for a in records], dtype=np.uint8),
+        "timestamps": np.array([_timestamp(a.get("submitted_at")) for a in records], dtype=np.int64),
+        "ids": np.array([id_number(a.get("id")) for a in records], dtype=np.uint32)
+    }
+
+
+def from_records(records: list[dict]) -> ResponseArrays:
+    """In-memory arrays for records that are not kept in a ResponseMatrix (e.g. archived cohorts)"""
+    cohort_ids = list(dict.fromkeys(a.get("cohort") for a in records))
+    codes = {cohort: i for i, cohort in enumerate(cohort_ids)}
+    return ResponseArrays(cohort_ids=cohort_ids, **_columns(records, codes))
+
+
+class ResponseMatrix:
+    """Append-only column files, memory-mapped for reading.
+
+    `state.json` records the row count and how far into the source (log byte
+    offset or SQLite sequence) the columns are current. Rows past the recorded
+    count, left by an interrupted append, are truncated before the next append.
+    Nothing is fsynced: the matrix is derived from the source and can always be
+    caught up from it, so a commit pays only for its log write. If a crash
+    leaves the state ahead of the column files, the state reads as empty and
+    the matrix is rebuilt.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.state_path = directory / "state.json"
+        self._lock = threading.Lock()
+        self._cache: Optional[tuple] = None
+
+    def state(self) -> dict:
+        """Row count, cohort codes and source position the columns are current up to"""
+        empty = {"rows": 0, "cohort_ids": [], "source": None, "position": 0}
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return empty
+        for file_name, dtype, width in COLUMNS.values():
+            path = self.directory / file_name
+            if state["rows"] and (not path.exists() or
+                                  path.stat().st_size < state["rows"] * width * np.dtype(dtype).itemsize):
+                # Columns lost in a crash: no source matches, so the owner rebuilds the matrix
+                return empty
+        return state
+
+    def reset(self, source=None) -> None:
+        """Discard all rows, e.g. after the source has been rewritten"""
+        with self._lock:
+            self.directory.mkdir(exist_ok=True)
+            for file_name, _, _ in COLUMNS.values():
+                (self.directory / file_name).unlink(missing_ok=True)
+            jsonl_store.atomic_write_json(
+                self.state_path, {"rows": 0, "cohort_ids": [], "source": source, "position": 0}, durable=False
+            )
+            self._cache = None
+
+    def append(self, records: list[dict], position: int, source=None) -> None:
+        """Append rows for new records and advance the source position (caller holds the writer lock)"""
+        with self._lock:
+            self.directory.mkdir(exist_ok=True)
+            state = self.state()
+            cohort_ids = state["cohort_ids"]
+            codes = {cohort: i for i, cohort in enumerate(cohort_ids)}
+            for a in records:
+                if a.get("cohort") not in codes:
+                    codes[a.get("cohort")] = len(cohort_ids)
+                    cohort_ids.append(a.get("cohort"))
+
+            columns = _columns(records, codes)
+            for name, (file_name, dtype, width) in COLUMNS.items():
+                with open(self.directory / file_name, "ab") as f:
+                    # Drop any rows an interrupted append wrote past the recorded count
+                    f.truncate(state["rows"] * width * np.dtype(dtype).itemsize)
+                    f.write(columns[name].tobytes())
+
+            state.update(rows=state["rows"] + len(records), cohort_ids=cohort_ids,
+                         source=source, position=position)
+            jsonl_store.atomic_write_json(self.state_path, state, durable=False)
+            self._cache = None
+
+    def load(self) -> ResponseArrays:
+        """Memory-map the columns (cached until the next append)"""
+        with self._lock:
+            state = self.state()
+            key = (state["rows"], state["position"], state["source"])
+            if self._cache is not None and self._cache[0] == key:
+                return self._cache[1]
+
+            rows = state["rows"]
+            arrays = {}
+            for name, (file_name, dtype, width) in COLUMNS.items():
+                shape = (rows, width) if width > 1 else (rows,)
+                if rows == 0:
+                    arrays[name] = np.zeros(shape, dtype=dtype)
+                else:
+                    arrays[name] = np.memmap(self.directory / file_name, dtype=dtype, mode="r", shape=shape)
+            view = ResponseArrays(cohort_ids=state["cohort_ids"], **arrays)
+            self._cache = (key, view)
+            return view
+
+
+def concatenate(parts: list[ResponseArrays]) -> ResponseArrays:
+    """Combine arrays from several stores, re-coding their cohorts into one shared list"""
+    if len(parts) == 1:
+        return parts[0]
+
+    cohort_ids: list[str] = []
+    cohort_codes = []
+    for part in parts:
+        for cohort in part.cohort_ids:
+            if cohort not in cohort_ids:
+                cohort_ids.append(cohort)
+        recode = np.array([cohort_ids.index(c) for c in part.cohort_ids], dtype=np.uint16)
+        cohort_codes.append(recode[part.cohorts] if len(part.cohorts) else part.cohorts)
+
+    def join(name: str, dtype, width: int) -> np.ndarray:
+        arrays = [getattr(part, name) for part in parts]
+        if not arrays:
+            return np.zeros((0, width) if width > 1 else (0,), dtype=dtype)
+        return np.concatenate(arrays)
+
+    return ResponseArrays(
+        responses=join("responses", np.uint8, NUM_QUESTIONS),
+        cohorts=np.concatenate(cohort_codes) if cohort_codes else np.zeros(0, dtype=np.uint16),
+        types=join("types", np.uint8, 1),
+        timestamps=join("timestamps", np.int64, 1),
+        ids=join("ids", np.uint32, 1),
+        cohort_ids=cohort_ids
+    )
+
+
+def question_averages(arrays: ResponseArrays, cohort_id: Optional[str] = None) -> tuple[np.ndarray, np.ndarray]:
+    """Mean score per question for pre and post assessments (zeros where there are none)"""
+    mask = arrays.cohort_mask(cohort_id)
+    averages = []
+    for type_code in (TYPE_PRE, TYPE_POST):
+        rows = arrays.responses[mask & (arrays.types == type_code)]
+        averages.append(rows.mean(axis=0) if len(rows) else np.zeros(NUM_QUESTIONS))
+    return averages[0], averages[1]
+
+
+class QuestionTotals:
+    """Per-question score sums and assessment counts for each cohort and type, kept current from the change feed.
+
+    Folding in only the assessments added since the last version keeps the
+    dashboard's question averages O(new submissions) per refresh instead of a
+    pass over the whole matrix. When the feed reports a reset the totals are
+    rebuilt from the snapshot's arrays.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._sums: dict[tuple[str, int], np.ndarray] = {}
+        self._counts: dict[tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, arrays: ResponseArrays) -> None:
+        for code, cohort in enumerate(arrays.cohort_ids):
+            in_cohort = arrays.cohorts == code
+            for type_code in (TYPE_PRE, TYPE_POST):
+                rows = arrays.responses[in_cohort & (arrays.types == type_code)]
+                if len(rows):
+                    key = (cohort, type_code)
+                    self._sums[key] = self._sums.get(key, 0) + rows.sum(axis=0, dtype=np.int64)
+                    self._counts[key] = self._counts.get(key, 0) + len(rows)
+
+    def _averages(self, cohort_id: Optional[str]) -> tuple[np.ndarray, np.ndarray]:
+        averages = []
+        for type_code in (TYPE_PRE, TYPE_POST):
+            keys = [k for k in self._counts if k[1] == type_code and (cohort_id is None or k[0] == cohort_id)]
+            count = sum(self._counts[k] for k in keys)
+            total = sum((self._sums[k] for k in keys), np.zeros(NUM_QUESTIONS, dtype=np.int64))
+            averages.append(total / count if count else np.zeros(NUM_QUESTIONS))
+        return averages[0], averages[1]
+
+    def question_averages(self, snapshot, get_changes, cohort_id: Optional[str] = None) -> tuple[np.ndarray, np.ndarray]:
+        """As question_averages over the snapshot's hot records, after folding in its changes.
+
+        get_changes(since_version, snapshot) is data_manager.get_changes. A
+        snapshot older than the totals (another session moved them on) is
+        answered from its own arrays.
+        """
+        with self._lock:
+            if snapshot.version < self.version:
+                return question_averages(snapshot.get_response_matrix(cohort_id), cohort_id)
+            if snapshot.version > self.version:
+                changes = get_changes(self.version, snapshot)
+                if changes.reset:
+                    self._sums.clear()
+                    self._counts.clear()
+                    self._add(snapshot.get_response_matrix())
+                elif changes.added:
+                    self._add(from_records([a.to_dict() for a in changes.added]))
+                self.version = snapshot.version
+            return self._averages(cohort_id)
@@ -0,0 +1,256 @@
+"""
+Per-cohort sharded JSONL storage for NELFT Mentoring Assessment
+Each cohort's assessments live in their own directory with their own log, lock, indexes and caches
+"""
+
+import json
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Optional
+
+import jsonl_store
+from participants_view import ParticipantsView
+from pre_index import PreAssessmentIndex
+from records import Assessment
+from response_matrix import ResponseArrays, ResponseMatrix
+
+LOG_NAME = "assessments.jsonl"
+SNAPSHOT_NAME = "snapshot.json"
+
+
+def shard_name(cohort_id: Optional[str]) -> str:
+    """Directory name for a cohort's shard"""
+    if not cohort_id:
+        return "_unassigned"
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", cohort_id)
+
+
+def read_snapshot(snapshot_path: Path, log_stat: Optional[tuple]) -> Optional[dict]:
+    """The snapshot of a log, or None if it is missing or was taken of a different (rewritten) log"""
+    if log_stat is None:
+        return None
+    try:
+        with open(snapshot_path, "r") as f:
+            snapshot = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if snapshot.get("log_inode") != log_stat[0] or snapshot.get("log_offset", 0) > log_stat[1]:
+        return None
+    return snapshot
+
+
+class LogCache:
+    """In-memory Assessment objects for one log, shared by every Streamlit session.
+
+    The log is only re-read when the file changes (inode, size or mtime). A log
+    that has only grown is caught up by parsing just the appended tail; a
+    rewritten log (new inode, since rewrites are atomic renames) is re-read.
+    A cold load starts from the compacted snapshot, if there is a current one,
+    and parses only the log tail written after it.
+    """
+
+    def __init__(self, log_path: Path, snapshot_path: Path):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._assessments: list[Assessment] = []
+        self._by_id: dict[str, Assessment] = {}
+        self._stat = None
+        self._offset = 0
+
+    def get(self) -> list[Assessment]:
+        """Get the cached assessments, reloading only if the log has changed"""
+        with self._lock:
+            stat = jsonl_store.file_stat(self.log_path)
+            if stat == self._stat:
+                return self._assessments
+
+            if stat and self._stat and stat[0] == self._stat[0] and stat[1] >= self._offset:
+                records, self._offset = jsonl_store.read_records_from(self.log_path, self._offset)
+                tail = [Assessment.from_dict(r) for r in records]
+                self._assessments = self._assessments + tail
+            else:
+                snapshot = read_snapshot(self.snapshot_path, stat)
+                if snapshot is not None:
+                    assessments = [Assessment.from_row(row) for row in snapshot["rows"]]
+                    offset = snapshot["log_offset"]
+                else:
+                    assessments, offset = [], 0
+                records, self._offset = jsonl_store.read_records_from(self.log_path, offset)
+                tail = [Assessment.from_dict(r) for r in records]
+                self._assessments = assessments + tail
+                self._by_id = {a.id: a for a in assessments}
+            self._by_id.update((a.id, a) for a in tail)
+
+            # Keyed on the pre-read stat so a write that landed mid-reload is seen next time
+            self._stat = stat
+            return self._assessments
+
+    def get_by_id(self) -> dict[str, Assessment]:
+        """Get the cached assessments keyed by id"""
+        self.get()
+        return self._by_id
+
+
+class AssessmentShard:
+    """One cohort's log together with its lock, pre-assessment index, pairing view and response matrix"""
+
+    def __init__(self, directory: Path, key_func: Callable[[dict], str]):
+        self.directory = directory
+        self.key_func = key_func
+        self.log_path = directory / LOG_NAME
+        self.snapshot_path = directory / SNAPSHOT_NAME
+        self.cache = LogCache(self.log_path, self.snapshot_path)
+        self.pre_index = PreAssessmentIndex(directory / "pre_index.jsonl", self.log_path, key_func)
+        self.participants = ParticipantsView(directory / "participants.json", self.log_path, key_func)
+        self.matrix = ResponseMatrix(directory / "responses")
+
+    def lock(self):
+        """Exclusive writer lock for this shard only"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return jsonl_store.file_lock(self.log_path)
+
+    def append(self, batch: list[dict]) -> None:
+        """Append records with ids already assigned and update derived data (shard lock held)"""
+        offsets = jsonl_store.append_records(self.log_path, batch)
+        self.pre_index.add([
+            (self.key_func(a), a["id"], offset)
+            for a, offset in zip(batch, offsets)
+            if a.get("assessment_type") == "pre"
+        ])
+        self.participants.update()
+        self.sync_matrix()
+
+    def rewrite(self, records: list[dict]) -> None:
+        """Replace the whole log and rebuild derived data (shard lock held)"""
+        jsonl_store.write_records(self.log_path, records)
+        self.snapshot_path.unlink(missing_ok=True)
+        self.pre_index.invalidate()
+        self.participants.invalidate()
+        self.sync_matrix()
+
+    def clear(self) -> None:
+        """Remove the log and its derived data, taking the shard out of the store (shard lock held)"""
+        self.log_path.unlink(missing_ok=True)
+        self.snapshot_path.unlink(missing_ok=True)
+        self.pre_index.invalidate()
+        self.participants.invalidate()
+        self.sync_matrix()
+
+    def sync_matrix(self) -> None:
+        """Append matrix rows for log records the matrix has not seen (shard lock held)"""
+        stat = jsonl_store.file_stat(self.log_path)
+        source, end = (stat[0], stat[1]) if stat else (None, 0)
+        state = self.matrix.state()
+        if state["source"] != source or state["position"] > end:
+            # A different or rewritten log: rebuild the matrix from the start
+            self.matrix.reset(source)
+            state = self.matrix.state()
+        if state["position"] == end:
+            return
+
+        records, position = jsonl_store.read_records_from(self.log_path, state["position"])
+        self.matrix.append(records, position, source)
+
+    def compact(self, min_tail_bytes: int = 0) -> bool:
+        """Fold the log tail into the snapshot; returns True if a new snapshot was written.
+
+        Only reads the log, so it never takes the shard's writer lock and
+        submissions carry on while it runs. The log itself is kept: it stays the
+        source of truth, and the index, pairing view and matrix refer to its
+        byte offsets. The pairing view is checkpointed on the same schedule.
+        """
+        self.participants.checkpoint(min_tail_bytes)
+        with jsonl_store.file_lock(self.snapshot_path):
+            stat = jsonl_store.file_stat(self.log_path)
+            if stat is None:
+                self.snapshot_path.unlink(missing_ok=True)
+                return False
+
+            snapshot = read_snapshot(self.snapshot_path, stat)
+            rows, offset = (snapshot["rows"], snapshot["log_offset"]) if snapshot else ([], 0)
+            if stat[1] - offset < max(min_tail_bytes, 1):
+                return False
+
+            records, offset = jsonl_store.read_records_from(self.log_path, offset)
+            if (jsonl_store.file_stat(self.log_path) or (None,))[0] != stat[0]:
+                # Rewritten while we were reading; the next run starts afresh
+                return False
+            rows.extend(Assessment.from_dict(r).to_row() for r in records)
+            snapshot = {"log_inode": stat[0], "log_offset": offset, "rows": rows}
+            jsonl_store.atomic_write(self.snapshot_path, json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+            return True
+
+    def response_arrays(self) -> ResponseArrays:
+        """This shard's response matrix, caught up with the log first if needed"""
+        stat = jsonl_store.file_stat(self.log_path)
+        state = self.matrix.state()
+        if stat is not None and (state["source"], state["position"]) != (stat[0], stat[1]):
+            with self.lock():
+                self.sync_matrix()
+        return self.matrix.load()
+
+
+class ShardedStore:
+    """Directory of per-cohort shards, so cohort reads and writes only touch their own files"""
+
+    def __init__(self, root: Path, key_func: Callable[[dict], str]):
+        self.root = root
+        self.key_func = key_func
+        self._lock = threading.Lock()
+        self._shards: dict[str, AssessmentShard] = {}
+
+    def _shard_by_name(self, name: str) -> AssessmentShard:
+        with self._lock:
+            if name not in self._shards:
+                self._shards[name] = AssessmentShard(self.root / name, self.key_func)
+            return self._shards[name]
+
+    def shard(self, cohort_id: Optional[str]) -> AssessmentShard:
+        """The shard for a cohort (its directory is created on first write)"""
+        return self._shard_by_name(shard_name(cohort_id))
+
+    def shards(self) -> list[AssessmentShard]:
+        """Every shard that has a log on disk"""
+        if not self.root.exists():
+            return []
+        names = sorted(p.parent.name for p in self.root.glob(f"*/{LOG_NAME}"))
+        return [self._shard_by_name(name) for name in names]
+
+    def append(self, batch: list[dict], assign_ids: Callable[[list[dict]], list[dict]]) -> None:
+        """Append a batch, locking each cohort's shard only while writing its records.
+
+        assign_ids returns the records to write, which may leave out repeats of
+        stored ones. It runs under each shard lock in turn, so whatever it locks
+        itself (the id sequence) is shared by writers to every cohort.
+        """
+        for name, records in _group_by_shard(batch).items():
+            shard = self._shard_by_name(name)
+            with shard.lock():
+                # Ids are allocated under the shard lock so id order matches log order
+                records = assign_ids(records)
+                if records:
+                    shard.append(records)
+
+    def compact(self, min_tail_bytes: int = 0) -> int:
+        """Compact every shard whose log has grown by at least min_tail_bytes; returns how many were"""
+        return sum(shard.compact(min_tail_bytes) for shard in self.shards())
+
+    def replace_all(self, records: list[dict]) -> None:
+        """Rewrite every shard so the store holds exactly `records`"""
+        groups = _group_by_shard(records)
+        names = set(groups) | {shard.directory.name for shard in self.shards()}
+        for name in sorted(names):
+            shard = self._shard_by_name(name)
+            with shard.lock():
+                shard.rewrite(groups.get(name, []))
+
+
+def _group_by_shard(records: list[dict]) -> dict[str, list[dict]]:
+    """Split records by cohort shard, keeping their order within each shard"""
+    groups = defaultdict(list)
+    for record in records:
+        groups[shard_name(record.get("cohort"))].append(record)
+    return groups
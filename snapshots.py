@@ -0,0 +1,266 @@
+"""
+Read snapshots for NELFT Mentoring Assessment
+Immutable, versioned views of the assessments for reports and exports, unaffected by submissions made while they run,
+and the change feed of assessments added between versions
+"""
+
+import heapq
+import operator
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from kpis import PairedArrays, cohort_kpis, extend_paired_arrays, paired_arrays
+from participants_view import pair_records
+from records import Assessment, id_number
+from response_matrix import ResponseArrays, from_records
+from storage_backends import assessment_key, pair_assessments, resolve_participant
+
+
+# Derived data a snapshot continues from the previous version's rather than rebuilding
+_EXTENDED = ("rows", "ids", "paired")
+
+
+def _participant_key(a: Assessment) -> str:
+    return assessment_key({"email": a.email, "cohort": a.cohort})
+
+
+def _pairing_input(assessments: Iterable[Assessment]) -> Iterator[dict]:
+    return (
+        {"id": a.id, "name": a.name, "email": a.email, "cohort": a.cohort, "assessment_type": a.assessment_type}
+        for a in assessments
+    )
+
+
+class AssessmentSnapshot:
+    """The stored assessments as of one data version, and everything derived from them.
+
+    A snapshot holds the backend's cached assessment list as it was when the
+    snapshot was taken. Writers never modify that list (they build a new one),
+    so taking a snapshot copies nothing and a long report holds no lock while
+    it runs. Pairing, per-cohort lists and response arrays are derived on first
+    use and cached with the snapshot, so every session reading the same
+    version shares them, and a report that runs while submissions arrive sees
+    one consistent version throughout. A snapshot given a `previous` one
+    (whose list its own starts with) continues the latest pairing, ids and KPI
+    arrays built by it or an earlier version instead of rebuilding them.
+
+    Archived cohorts named with `including` are read from their cold records
+    on top of the hot snapshot, as in data_manager.
+    """
+
+    def __init__(self, assessments: list[Assessment], version: int,
+                 live_arrays: Callable[[Optional[str]], ResponseArrays],
+                 previous: Optional["AssessmentSnapshot"] = None):
+        self.assessments = assessments
+        self.version = version
+        self.archived: dict[str, list[Assessment]] = {}
+        self._live_arrays = live_arrays
+        # Derived data, shared by every view of this version (see including)
+        self._cache: dict = {}
+        self._lock = threading.RLock()
+        if previous is not None:
+            # The latest derived data of each kind, with the list length it covers: the previous
+            # snapshot's own, or what it was itself going to extend. Kept until this snapshot has
+            # derived its own, and never linking back to earlier snapshots.
+            inherited = previous._cache.get("previous", {})
+            self._cache["previous"] = {
+                name: (len(previous.assessments), previous._cache[name]) if name in previous._cache
+                else inherited[name]
+                for name in _EXTENDED if name in previous._cache or name in inherited
+            }
+
+    def including(self, archived: dict[str, list[Assessment]]) -> "AssessmentSnapshot":
+        """This snapshot with archived cohorts' cold records added"""
+        if not archived:
+            return self
+        view = object.__new__(AssessmentSnapshot)
+        view.__dict__.update(self.__dict__)
+        view.archived = archived
+        return view
+
+    def _cached(self, name: str, build: Callable):
+        with self._lock:
+            if name not in self._cache:
+                self._cache[name] = build()
+                if all(derived in self._cache for derived in _EXTENDED):
+                    self._cache.pop("previous", None)
+            return self._cache[name]
+
+    def _rows(self) -> dict:
+        """Pairing rows (name, email, cohort, pre_id, post_id) keyed by participant"""
+        extends = self._cache.get("previous", {}).get("rows")
+        if extends is not None:
+            start, previous_rows = extends
+            tail = self.assessments[start:]
+            rows = dict(previous_rows)
+            # Copy the rows the tail touches; the previous snapshot's rows are left as they were
+            for key in {_participant_key(a) for a in tail}:
+                if key in rows:
+                    rows[key] = dict(rows[key])
+            return pair_records(rows, _pairing_input(tail), assessment_key)
+        return pair_records({}, _pairing_input(self.assessments), assessment_key)
+
+    def _ids(self) -> np.ndarray:
+        """Numeric assessment ids of the hot records"""
+        extends = self._cache.get("previous", {}).get("ids")
+        if extends is not None:
+            start, previous_ids = extends
+            tail = np.array([id_number(a.id) for a in self.assessments[start:]], dtype=np.uint32)
+            return np.concatenate([previous_ids, tail])
+        return np.array([id_number(a.id) for a in self.assessments], dtype=np.uint32)
+
+    def _paired(self) -> tuple[PairedArrays, dict[str, int]]:
+        """KPI arrays of the hot participants, with the participant key -> row map used to extend them"""
+        extends = self._cache.get("previous", {}).get("paired")
+        if extends is not None:
+            start, (arrays, rows) = extends
+            return extend_paired_arrays(arrays, rows, self.assessments[start:], _participant_key)
+        # Rows are in pairing order, as the participants are
+        rows = self._cached("rows", self._rows)
+        return paired_arrays(self._hot_participants()), {key: row for row, key in enumerate(rows)}
+
+    def _hot_participants(self) -> list[dict]:
+        def build():
+            rows = self._cached("rows", self._rows)
+            by_id = self._cached("by_id", lambda: {a.id: a for a in self.assessments})
+            return [resolve_participant(row, by_id) for row in rows.values()]
+        return self._cached("participants", build)
+
+    def _hot_by_cohort(self, cohort_id: str) -> list[Assessment]:
+        def build():
+            groups: dict[str, list[Assessment]] = {}
+            for a in self.assessments:
+                groups.setdefault(a.cohort, []).append(a)
+            return groups
+        return self._cached("by_cohort", build).get(cohort_id, [])
+
+    def load_assessments(self) -> list[Assessment]:
+        """All hot assessments in id order (archived cohorts are not included)"""
+        return list(self.assessments)
+
+    def iter_assessments(self) -> Iterator[Assessment]:
+        """Iterate the hot assessments in id order"""
+        return iter(self.assessments)
+
+    def get_assessments_by_cohort(self, cohort_id: str) -> list[Assessment]:
+        """A cohort's assessments, its cold records first if it was included as archived"""
+        hot = self._hot_by_cohort(cohort_id)
+        cold = self.archived.get(cohort_id)
+        if cold is None:
+            return list(hot)
+        cold_ids = {a.id for a in cold}
+        return cold + [a for a in hot if a.id not in cold_ids]
+
+    def get_recent_assessments(self, cohort_id: Optional[str] = None, limit: int = 10) -> list[Assessment]:
+        """Latest submissions first, optionally for one cohort"""
+        def build():
+            assessments = self.get_assessments_by_cohort(cohort_id) if cohort_id else self.assessments
+            return heapq.nlargest(limit, assessments, key=lambda a: (a.submitted_at or "", id_number(a.id)))
+        if cohort_id in self.archived:
+            return build()
+        return list(self._cached(("recent", cohort_id, limit), build))
+
+    def get_participant_data(self) -> list[dict]:
+        """Participants with pre_assessment / post_assessment, as data_manager.get_participant_data"""
+        participants = self._hot_participants()
+        if not self.archived:
+            return list(participants)
+        participants = [p for p in participants if p["cohort"] not in self.archived]
+        for cohort_id in sorted(self.archived):
+            participants.extend(pair_assessments(self.get_assessments_by_cohort(cohort_id)))
+        return participants
+
+    def get_kpis(self) -> dict[Optional[str], dict]:
+        """KPIs for every cohort and overall (key None), computed in one vectorised pass (see kpis.cohort_kpis).
+
+        The arrays behind them are extended from the previous version's by the
+        assessments added since, so a new submission does not re-read every
+        participant.
+        """
+        if self.archived:
+            return cohort_kpis(paired_arrays(self.get_participant_data()))
+        return self._cached("kpis", lambda: cohort_kpis(self._cached("paired", self._paired)[0]))
+
+    def get_response_matrix(self, cohort_id: Optional[str] = None) -> ResponseArrays:
+        """Response columns for exactly this snapshot's records (filter with cohort_mask).
+
+        Rows are taken from the live memory-mapped matrix, leaving out any
+        written after the snapshot; if the matrix no longer holds every record
+        (e.g. it was rebuilt), the arrays are built from the records instead.
+        """
+        if cohort_id in self.archived:
+            return from_records([a.to_dict() for a in self.get_assessments_by_cohort(cohort_id)])
+
+        def build():
+            live = self._live_arrays(cohort_id)
+            mask = live.cohort_mask(cohort_id) & np.isin(live.ids, self._cached("ids", self._ids))
+            expected = len(self._hot_by_cohort(cohort_id)) if cohort_id else len(self.assessments)
+            if int(mask.sum()) == expected:
+                return live.select(mask)
+            records = self._hot_by_cohort(cohort_id) if cohort_id else self.assessments
+            return from_records([a.to_dict() for a in records])
+        return self._cached(("arrays", cohort_id), build)
+
+
+class Changes(NamedTuple):
+    """Assessments added between two data versions"""
+    since: int
+    version: int
+    added: list[Assessment]  # In id order
+    reset: bool  # History was rewritten (e.g. a cohort archived): rebuild from a snapshot instead of applying `added`
+
+
+def _extends(previous: list[Assessment], assessments: list[Assessment]) -> bool:
+    """Whether `assessments` is `previous` with records appended (the same objects, in the same order)"""
+    return len(previous) <= len(assessments) and all(map(operator.is_, previous, assessments))
+
+
+class SnapshotHistory:
+    """Issues snapshot versions and records how each extends the last, which is the change feed.
+
+    Versions increase by one whenever the stored assessment list changes. For
+    each version since the last rewrite the history keeps the list length, so
+    the records added after any of them are a slice of the current list.
+    """
+
+    def __init__(self, live_arrays: Callable[[Optional[str]], ResponseArrays], max_versions: int = 10000):
+        self._live_arrays = live_arrays
+        self._max_versions = max_versions
+        self._lock = threading.Lock()
+        self._current: Optional[AssessmentSnapshot] = None
+        # Version -> list length, for versions the current list extends append-only
+        self._lengths: OrderedDict[int, int] = OrderedDict()
+
+    def take(self, assessments: list[Assessment]) -> AssessmentSnapshot:
+        """The snapshot of this list, starting a new version if it differs from the current one"""
+        with self._lock:
+            current = self._current
+            if current is not None and current.assessments is assessments:
+                return current
+
+            extends = current is not None and _extends(current.assessments, assessments)
+            if not extends:
+                self._lengths.clear()
+            snapshot = AssessmentSnapshot(
+                assessments, current.version + 1 if current else 1, self._live_arrays,
+                previous=current if extends else None
+            )
+            self._lengths[snapshot.version] = len(assessments)
+            while len(self._lengths) > self._max_versions:
+                self._lengths.popitem(last=False)
+            self._current = snapshot
+            return snapshot
+
+    def changes(self, since_version: int, snapshot: AssessmentSnapshot) -> Changes:
+        """Assessments added after since_version, up to the given snapshot"""
+        if since_version == snapshot.version:
+            return Changes(since_version, snapshot.version, [], False)
+        with self._lock:
+            start = self._lengths.get(since_version)
+            known = snapshot.version in self._lengths
+        if start is None or not known or since_version > snapshot.version:
+            return Changes(since_version, snapshot.version, [], True)
+        return Changes(since_version, snapshot.version, snapshot.assessments[start:], False)
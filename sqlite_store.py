@@ -0,0 +1,234 @@
+"""
+SQLite storage for NELFT Mentoring Assessment
+Indexed alternative to the JSONL log, selected with ASSESSMENT_STORAGE=sqlite
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterator, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    email_normalized TEXT NOT NULL,
+    cohort TEXT,
+    assessment_type TEXT,
+    submitted_at TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_assessments_match
+    ON assessments (email_normalized, cohort, assessment_type);
+CREATE INDEX IF NOT EXISTS idx_assessments_cohort
+    ON assessments (cohort, assessment_type);
+CREATE INDEX IF NOT EXISTS idx_assessments_submitted
+    ON assessments (submitted_at);
+CREATE TABLE IF NOT EXISTS participants (
+    email_normalized TEXT NOT NULL,
+    cohort TEXT,
+    name TEXT,
+    email TEXT,
+    pre_id TEXT,
+    post_id TEXT,
+    PRIMARY KEY (email_normalized, cohort)
+);
+"""
+
+# Materialised pairing: the first record sets name/email, each later one fills its slot
+UPSERT_PARTICIPANT = """
+INSERT INTO participants (email_normalized, cohort, name, email, pre_id, post_id)
+VALUES (:email_normalized, :cohort, :name, :email, :pre_id, :post_id)
+ON CONFLICT (email_normalized, cohort) DO UPDATE SET
+    pre_id = COALESCE(excluded.pre_id, pre_id),
+    post_id = COALESCE(excluded.post_id, post_id)
+"""
+
+# Streamlit serves each session on its own thread, so connections are per thread
+_local = threading.local()
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Get this thread's connection to the database, creating the schema if needed"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _backfill_participants(conn)
+        connections[path] = conn
+    return conn
+
+
+def _row_values(assessment: dict) -> tuple:
+    """Column values for an assessment row"""
+    return (
+        assessment["id"],
+        assessment.get("email", "").lower().strip(),
+        assessment.get("cohort"),
+        assessment.get("assessment_type"),
+        assessment.get("submitted_at"),
+        json.dumps(assessment)
+    )
+
+
+def _participant_values(assessment: dict) -> dict:
+    """Parameters for upserting an assessment into the participants view"""
+    is_pre = assessment.get("assessment_type") == "pre"
+    return {
+        "email_normalized": assessment.get("email", "").lower().strip(),
+        "cohort": assessment.get("cohort"),
+        "name": assessment.get("name"),
+        "email": assessment.get("email"),
+        "pre_id": assessment["id"] if is_pre else None,
+        "post_id": None if is_pre else assessment["id"]
+    }
+
+
+def _backfill_participants(conn: sqlite3.Connection) -> None:
+    """Populate the participants view for a database created before it existed"""
+    if conn.execute("SELECT 1 FROM participants LIMIT 1").fetchone() is not None:
+        return
+    with conn:
+        conn.executemany(UPSERT_PARTICIPANT, [_participant_values(a) for a in load_assessments(conn)])
+
+
+def load_assessments(conn: sqlite3.Connection) -> list[dict]:
+    """Load all assessments in submission order"""
+    rows = conn.execute("SELECT record FROM assessments ORDER BY seq")
+    return [json.loads(record) for (record,) in rows]
+
+
+def save_assessments(conn: sqlite3.Connection, assessments: list[dict]) -> None:
+    """Replace all stored assessments in one transaction"""
+    with conn:
+        conn.execute("DELETE FROM assessments")
+        conn.execute("DELETE FROM participants")
+        conn.executemany(
+            "INSERT INTO assessments (id, email_normalized, cohort, assessment_type, submitted_at, record) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [_row_values(a) for a in assessments]
+        )
+        conn.executemany(UPSERT_PARTICIPANT, [_participant_values(a) for a in assessments])
+
+
+def insert_assessments(conn: sqlite3.Connection, assessments: list[dict]) -> list[dict]:
+    """Insert a batch of assessments (ids already assigned) in one transaction"""
+    with conn:
+        conn.executemany(
+            "INSERT INTO assessments (id, email_normalized, cohort, assessment_type, submitted_at, record) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [_row_values(a) for a in assessments]
+        )
+        conn.executemany(UPSERT_PARTICIPANT, [_participant_values(a) for a in assessments])
+    return assessments
+
+
+def find_ids(conn: sqlite3.Connection, ids: list[str]) -> dict[str, str]:
+    """The cohort of each of these ids that is stored, keyed by id"""
+    found = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows = conn.execute(
+            f"SELECT id, cohort FROM assessments WHERE id IN ({','.join('?' * len(chunk))})", chunk
+        )
+        found.update(rows)
+    return found
+
+
+def delete_cohort(conn: sqlite3.Connection, cohort_id: str) -> None:
+    """Delete a cohort's assessments and participant rows"""
+    with conn:
+        conn.execute("DELETE FROM assessments WHERE cohort = ?", (cohort_id,))
+        conn.execute("DELETE FROM participants WHERE cohort = ?", (cohort_id,))
+
+
+def count_assessments(conn: sqlite3.Connection) -> int:
+    """Number of stored assessments"""
+    (count,) = conn.execute("SELECT COUNT(*) FROM assessments").fetchone()
+    return count
+
+
+def last_seq(conn: sqlite3.Connection) -> int:
+    """Sequence number of the most recently inserted assessment (0 if none)"""
+    (seq,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM assessments").fetchone()
+    return seq
+
+
+def checkpoint(conn: sqlite3.Connection) -> bool:
+    """Copy committed WAL pages into the database without waiting on readers or writers"""
+    busy, _, _ = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    return not busy
+
+
+def read_records_after(conn: sqlite3.Connection, seq: int) -> tuple[list[dict], int]:
+    """Read assessments inserted after a sequence number, returning them with the last seq read"""
+    rows = conn.execute(
+        "SELECT seq, record FROM assessments WHERE seq > ? ORDER BY seq", (seq,)
+    ).fetchall()
+    if not rows:
+        return [], seq
+    return [json.loads(record) for _, record in rows], rows[-1][0]
+
+
+def find_pre_assessment(conn: sqlite3.Connection, email: str, cohort: str) -> Optional[dict]:
+    """Find a pre-assessment using the (email, cohort, type) index"""
+    row = conn.execute(
+        "SELECT record FROM assessments "
+        "WHERE email_normalized = ? AND cohort = ? AND assessment_type = 'pre' "
+        "ORDER BY seq LIMIT 1",
+        (email.lower().strip(), cohort)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def get_assessments_by_cohort(conn: sqlite3.Connection, cohort_id: str) -> list[dict]:
+    """Get all assessments for a cohort using the cohort index"""
+    rows = conn.execute(
+        "SELECT record FROM assessments WHERE cohort = ? ORDER BY seq",
+        (cohort_id,)
+    )
+    return [json.loads(record) for (record,) in rows]
+
+
+def iter_assessments(conn: sqlite3.Connection, cohort_id: Optional[str] = None) -> Iterator[dict]:
+    """Yield assessments in submission order, optionally for one cohort, fetching rows as they are consumed"""
+    if cohort_id is None:
+        rows = conn.execute("SELECT record FROM assessments ORDER BY seq")
+    else:
+        rows = conn.execute("SELECT record FROM assessments WHERE cohort = ? ORDER BY seq", (cohort_id,))
+    for (record,) in rows:
+        yield json.loads(record)
+
+
+def get_recent_assessments(conn: sqlite3.Connection, cohort_id: Optional[str], limit: int) -> list[dict]:
+    """Get the most recently submitted assessments using the submitted_at index"""
+    if cohort_id:
+        rows = conn.execute(
+            "SELECT record FROM assessments WHERE cohort = ? "
+            "ORDER BY submitted_at DESC LIMIT ?",
+            (cohort_id, limit)
+        )
+    else:
+        rows = conn.execute(
+            "SELECT record FROM assessments ORDER BY submitted_at DESC LIMIT ?",
+            (limit,)
+        )
+    return [json.loads(record) for (record,) in rows]
+
+
+def get_participant_rows(conn: sqlite3.Connection) -> list[dict]:
+    """Read the participants view: name, email, cohort, pre_id and post_id"""
+    rows = conn.execute(
+        "SELECT name, email, cohort, pre_id, post_id FROM participants ORDER BY rowid"
+    )
+    return [
+        {"name": name, "email": email, "cohort": cohort, "pre_id": pre_id, "post_id": post_id}
+        for name, email, cohort, pre_id, post_id in rows
+    ]
@@ -0,0 +1,259 @@
+"""
+Local storage daemon for NELFT Mentoring Assessment
+One process owns the assessment files, batches commits from every app replica and serves their queries
+
+Usage:
+    python storage_daemon.py                          # listens on data/storage.sock
+    python storage_daemon.py --address 127.0.0.1:8765
+
+Start the daemon, then run each Streamlit replica with
+ASSESSMENT_STORAGE_SERVER set to the same address; data_manager then sends
+assessment reads and writes to the daemon instead of opening the files
+itself. Replicas and the daemon share ASSESSMENT_DATA_DIR (archived cohorts
+and cohorts.json are still read from it directly).
+
+The daemon does not authenticate clients: a TCP address must be a loopback
+host, and the Unix socket is created readable and writable by its owner only.
+Replacing all assessments (save_assessments) is not served.
+
+The protocol is one JSON object per line: {"method": ..., "params": {...}}
+answered by {"result": ...} or {"error": ..., "type": ...}.
+"""
+
+import argparse
+import atexit
+import ipaddress
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+# Address used when neither --address nor ASSESSMENT_STORAGE_SERVER is given, relative to the data directory
+DEFAULT_SOCKET_NAME = "storage.sock"
+# The protocol has no authentication, so only the daemon's own user may connect to its socket
+SOCKET_MODE = 0o600
+
+
+class StorageServerError(RuntimeError):
+    """An error raised by the storage daemon while handling a request"""
+
+
+def _tcp_address(address: str):
+    """(host, port) for a "host:port" address, or None for a Unix socket path"""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return host, int(port)
+    return None
+
+
+def _is_loopback(host: str) -> bool:
+    """Whether a TCP host only accepts connections from this machine"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+def _encode(value: Any) -> Any:
+    """Make a data_manager result JSON-serialisable (records become dicts)"""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    return value
+
+
+class StorageClient:
+    """Connection to a storage daemon; each thread keeps its own socket open between calls"""
+
+    def __init__(self, address: str):
+        self.address = address
+        self._local = threading.local()
+
+    def _connect(self):
+        tcp = _tcp_address(self.address)
+        if tcp:
+            sock = socket.create_connection(tcp)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.address)
+        return sock.makefile("rwb")
+
+    def call(self, method: str, **params) -> Any:
+        """Call a daemon method and return its result, raising its error if it failed"""
+        stream = getattr(self._local, "stream", None)
+        try:
+            if stream is None:
+                stream = self._local.stream = self._connect()
+            stream.write((json.dumps({"method": method, "params": params}, separators=(",", ":")) + "\n").encode("utf-8"))
+            stream.flush()
+            line = stream.readline()
+            if not line:
+                raise ConnectionError(f"Storage daemon at {self.address} closed the connection")
+        except OSError:
+            # Reconnect on the next call (e.g. after the daemon restarts); this call is not retried
+            self._local.stream = None
+            raise
+
+        response = json.loads(line)
+        if "error" in response:
+            raise (ValueError if response.get("type") == "ValueError" else StorageServerError)(response["error"])
+        return response["result"]
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+# Windows has no Unix sockets; give the daemon a host:port address there
+class _UnixServer(getattr(socketserver, "ThreadingUnixStreamServer", socketserver.ThreadingTCPServer)):
+    daemon_threads = True
+
+    def server_bind(self):
+        super().server_bind()
+        if isinstance(self.server_address, str):
+            os.chmod(self.server_address, SOCKET_MODE)
+
+
+class StorageServer:
+    """Serves data_manager's assessment functions to StorageClients.
+
+    Submissions from every connection go through one BackgroundWriter, so
+    concurrent replicas share group commits. Clients keep a full copy of the
+    assessments tagged with the daemon's data version (see
+    data_manager.get_changes) and fetch only the records added since, or the
+    whole list again after a rewrite or a daemon restart.
+    """
+
+    def __init__(self, address: str):
+        tcp = _tcp_address(address)
+        if tcp and not _is_loopback(tcp[0]):
+            # Anyone who can connect can read every assessment and archive cohorts
+            raise ValueError(f"The storage daemon only listens on loopback addresses, not {tcp[0]!r}")
+
+        # This process owns the files, so its own data_manager must not act as a client
+        os.environ.pop("ASSESSMENT_STORAGE_SERVER", None)
+        import data_manager
+        import jsonl_store
+
+        self.address = address
+        # Versions are only meaningful to this daemon process, so they carry a per-process prefix
+        self.instance = os.urandom(4).hex()
+        dm = data_manager
+        writer = jsonl_store.BackgroundWriter(dm.add_assessments, dm.GROUP_COMMIT_WINDOW, name="daemon-writer")
+        atexit.register(writer.flush, dm.SHUTDOWN_FLUSH_TIMEOUT)
+
+        def add_assessments(records):
+            futures = [writer.submit(r) for r in records]
+            return [f.result() for f in futures]
+
+        def load_assessments(if_version=None):
+            snapshot = dm.read_snapshot()
+            version = f"{self.instance}:{snapshot.version}"
+            if if_version == version:
+                return {"version": version, "records": None}
+            instance, _, since = (if_version or "").partition(":")
+            if instance == self.instance:
+                changes = dm.get_changes(int(since), snapshot)
+                if not changes.reset:
+                    return {"version": version, "records": None, "added": changes.added}
+            return {"version": version, "records": snapshot.assessments}
+
+        self.reads: dict[str, Callable] = {
+            "version": lambda: f"{self.instance}:{dm.data_version()}",
+            "load_assessments": load_assessments,
+            "find_pre_assessment": dm.find_pre_assessment,
+            "get_assessments_by_cohort": dm.get_assessments_by_cohort,
+            "iter_assessments": lambda: list(dm.iter_assessments()),
+            "iter_assessments_by_cohort": lambda cohort_id: list(dm.iter_assessments_by_cohort(cohort_id)),
+            "get_recent_assessments": dm.get_recent_assessments,
+            "get_participant_data": dm.get_participant_data,
+            "compact_assessments": dm.compact_assessments
+        }
+        self.writes: dict[str, Callable] = {
+            "add_assessments": add_assessments,
+            "archive_cohort": dm.archive_cohort,
+            "restore_cohort": dm.restore_cohort
+        }
+
+    def handle(self, request: dict) -> dict:
+        """Run one request and build its response"""
+        method, params = request.get("method"), request.get("params") or {}
+        func = self.reads.get(method) or self.writes.get(method)
+        if func is None:
+            return {"error": f"Unknown method {method!r}", "type": "ValueError"}
+        try:
+            result = func(**params)
+        except Exception as e:
+            return {"error": str(e), "type": type(e).__name__}
+        return {"result": _encode(result)}
+
+    def serve_forever(self) -> None:
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = server.handle(json.loads(line))
+                    except json.JSONDecodeError as e:
+                        response = {"error": f"Invalid request: {e}", "type": "ValueError"}
+                    self.wfile.write((json.dumps(response, separators=(",", ":")) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+        tcp = _tcp_address(self.address)
+        if tcp:
+            listener = _TCPServer(tcp, Handler)
+        else:
+            path = Path(self.address)
+            if path.exists():
+                try:
+                    StorageClient(self.address).call("version")
+                except OSError:
+                    path.unlink()  # Left behind by a daemon that did not shut down cleanly
+                else:
+                    raise RuntimeError(f"A storage daemon is already listening on {path}")
+            listener = _UnixServer(str(path), Handler)
+
+        with listener:
+            try:
+                listener.serve_forever()
+            finally:
+                if not tcp:
+                    Path(self.address).unlink(missing_ok=True)
+
+
+def default_address() -> str:
+    data_dir = Path(os.environ.get("ASSESSMENT_DATA_DIR", Path(__file__).parent / "data"))
+    return os.environ.get("ASSESSMENT_STORAGE_SERVER") or str(data_dir / DEFAULT_SOCKET_NAME)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the local assessment storage daemon")
+    parser.add_argument("--address", default=default_address(),
+                        help="Unix socket path or host:port to listen on (default: %(default)s)")
+    args = parser.parse_args()
+
+    server = StorageServer(args.address)
+    # Shut down cleanly on SIGTERM too, so queued submissions are flushed and the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Storage daemon listening on {args.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
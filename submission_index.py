@@ -0,0 +1,90 @@
+"""
+Duplicate submission index for NELFT Mentoring Assessment
+Finds the stored assessment a new submission repeats, by its idempotency key or its content, in O(1)
+"""
+
+import hashlib
+import threading
+from typing import Optional, Union
+
+from records import Assessment, decode_responses
+
+# Record field holding the idempotency key the app gives each assessment form
+SUBMISSION_KEY = "submission_key"
+
+
+def content_hash(email: str, cohort: Optional[str], assessment_type: Optional[str], responses: tuple) -> bytes:
+    """Digest of what makes two submissions the same: participant, cohort, assessment type and scores"""
+    content = "|".join([email.lower().strip(), cohort or "", assessment_type or "", ",".join(map(str, responses))])
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+
+
+def _record_hash(record: dict) -> bytes:
+    return content_hash(record.get("email", ""), record.get("cohort"), record.get("assessment_type"),
+                        decode_responses(record))
+
+
+def _assessment_hash(a: Assessment) -> bytes:
+    return content_hash(a.email, a.cohort, a.assessment_type, a.responses)
+
+
+class SubmissionIndex:
+    """Stored assessments by idempotency key and by content hash, kept current from the change feed.
+
+    Like response_matrix.QuestionTotals, the index folds in only the
+    assessments added since the version it last saw, and is rebuilt from the
+    snapshot when the feed reports a reset. Only the first stored copy of any
+    content is indexed, so a duplicate always resolves to the original.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._by_key: dict[str, Assessment] = {}
+        self._by_content: dict[bytes, Assessment] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, assessments: list[Assessment]) -> None:
+        for a in assessments:
+            key = a.submission_key
+            if key:
+                self._by_key.setdefault(key, a)
+            self._by_content.setdefault(_assessment_hash(a), a)
+
+    def _advance(self, snapshot, get_changes) -> None:
+        # A snapshot older than the index (taken by another writer thread) needs nothing new
+        if snapshot.version <= self.version:
+            return
+        changes = get_changes(self.version, snapshot)
+        if changes.reset:
+            self._by_key.clear()
+            self._by_content.clear()
+            self._add(snapshot.assessments)
+        else:
+            self._add(changes.added)
+        self.version = snapshot.version
+
+    def find(self, records: list[dict], snapshot, get_changes) -> list[Optional[Union[Assessment, dict]]]:
+        """For each new record, the stored assessment or earlier record in the list it repeats (None if new).
+
+        get_changes(since_version, snapshot) is data_manager.get_changes; call
+        this under the writer lock with a snapshot taken there, so no other
+        writer can store a copy in between.
+        """
+        with self._lock:
+            self._advance(snapshot, get_changes)
+            pending_keys: dict[str, dict] = {}
+            pending_content: dict[bytes, dict] = {}
+            originals = []
+            for record in records:
+                key = record.get(SUBMISSION_KEY)
+                digest = _record_hash(record)
+                original = (
+                    (key and (self._by_key.get(key) or pending_keys.get(key)))
+                    or self._by_content.get(digest) or pending_content.get(digest)
+                )
+                if original is None:
+                    if key:
+                        pending_keys[key] = record
+                    pending_content[digest] = record
+                originals.append(original or None)
+            return originals